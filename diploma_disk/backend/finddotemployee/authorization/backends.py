@@ -4,7 +4,8 @@ from django.conf import settings
 import jwt
 from rest_framework import authentication, exceptions
 
-from .models import CustomUser
+from .principal import resolve_principal
+from .user_cache import user_cache
 
 
 class JWTAuthentication(authentication.BaseAuthentication):
@@ -40,10 +41,11 @@ class JWTAuthentication(authentication.BaseAuthentication):
             msg = 'Токен испорчен'
             raise exceptions.AuthenticationFailed(msg)
 
-        try:
-            user = CustomUser.objects.get(pk=payload['id'])
-        except CustomUser.DoesNotExist:
+        # Пользователь и его роль берутся из кэша процесса, запрос к БД — только при промахе
+        user = user_cache.get(payload['id'])
+        if user is None:
             msg = 'Пользователь соответствующий данному токену не найден.'
             raise exceptions.AuthenticationFailed(msg)
 
+        user, user.principal = resolve_principal(user, payload)
         return user, token
\ No newline at end of file
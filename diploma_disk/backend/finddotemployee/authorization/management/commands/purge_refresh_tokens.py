@@ -0,0 +1,31 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from pytz import timezone
+
+from authorization.models import RefreshToken
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истекшие refresh-токены пачками (для запуска по расписанию).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Строк за одно удаление.')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Пауза между пачками, секунды.')
+
+    def handle(self, *args, batch_size, sleep, **options):
+        now = datetime.now(timezone(settings.TIME_ZONE))
+        # Индекс expires: истекшие строки выбираются без полного просмотра таблицы.
+        # Использованные токены удаляются сразу при обновлении, поэтому отдельно их не ищем
+        stale = RefreshToken.objects.filter(expires__lte=now).order_by('pk')
+        total = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            total += RefreshToken.objects.filter(pk__in=ids).delete()[0]
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(f'Удалено refresh-токенов: {total}')
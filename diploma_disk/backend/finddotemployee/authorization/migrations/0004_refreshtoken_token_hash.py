@@ -0,0 +1,40 @@
+import datetime
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_tokens(apps, schema_editor):
+    RefreshToken = apps.get_model('authorization', 'RefreshToken')
+    for token in RefreshToken.objects.only('id', 'token').iterator(chunk_size=2000):
+        RefreshToken.objects.filter(pk=token.pk).update(token_hash=hashlib.sha256(token.token.encode()).hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authorization', '0003_customuser_claims_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='token_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='refreshtoken',
+            name='token',
+        ),
+        migrations.AlterField(
+            model_name='refreshtoken',
+            name='token_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='refreshtoken',
+            name='expires',
+            field=models.DateTimeField(db_index=True, default=datetime.datetime.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authorization', '0004_refreshtoken_token_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime, timedelta
 
 from django.conf import settings
@@ -7,7 +8,7 @@ from django.db import models
 from pytz import timezone
 
 from .managers import CustomUserManager
-from .token_generators import generate_jwt
+from .token_generators import generate_jwt, generate_rt
 
 
 # Create your models here.
@@ -16,6 +17,10 @@ from .token_generators import generate_jwt
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.CharField(max_length=64, verbose_name='email', unique=True)
     is_staff = models.BooleanField(default=False)
+    # Увеличивается при смене роли, claims токенов со старой версией не используются
+    claims_version = models.PositiveIntegerField(default=0, editable=False)
+    # Увеличивается при изменении данных профиля, из нее строится ETag ответа ProfileView
+    profile_version = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
 
@@ -24,14 +29,36 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    # Меняются только UPDATE с F() + 1 (bump_claims_version, bump_profile_version)
+    VERSION_FIELDS = ('claims_version', 'profile_version')
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # Сохранение объекта, загруженного раньше (например, из user_cache), не должно
+        # возвращать выданную ранее версию: claims старых токенов снова стали бы действующими
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VERSION_FIELDS
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     @property
     def access_token(self):
-        return generate_jwt(self.pk)
+        from .principal import token_claims
+        return generate_jwt(self.pk, token_claims(self.pk))
 
 
 class RefreshToken(models.Model):
-    token = models.CharField(max_length=255)
-    expires = models.DateTimeField(default=datetime.now)
+    """
+    Refresh-токен пользователя.
+
+    Хранится только SHA-256 токена: поиск идет по уникальному индексу token_hash,
+    а утечка таблицы не раскрывает действующие токены. Число токенов на
+    пользователя ограничено REFRESH_TOKENS_PER_USER, истекшие и использованные
+    строки удаляет команда purge_refresh_tokens.
+    """
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires = models.DateTimeField(default=datetime.now, db_index=True)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     used = models.BooleanField(default=False)
 
@@ -42,4 +69,26 @@ class RefreshToken(models.Model):
         super().save(force_insert, force_update, using, update_fields)
 
     def __str__(self):
-        return self.token
+        return self.token_hash
+
+    @staticmethod
+    def hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user):
+        """Создает токен пользователю, удаляя самые старые сверх лимита, и возвращает его значение."""
+        token = generate_rt()
+        cls.objects.create(token_hash=cls.hash(token), user=user)
+        limit = getattr(settings, 'REFRESH_TOKENS_PER_USER', 10)
+        stale = list(cls.objects.filter(user=user).order_by('-expires', '-pk').values_list('pk', flat=True)[limit:])
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        return token
+
+    @classmethod
+    def find(cls, token):
+        """Токен по значению из запроса или None."""
+        if not token:
+            return None
+        return cls.objects.select_related('user').filter(token_hash=cls.hash(token)).first()
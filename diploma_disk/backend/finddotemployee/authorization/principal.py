@@ -0,0 +1,94 @@
+"""
+Principal — кто выполняет запрос: id пользователя и его роль.
+
+Роль (id HR и его компании, id кандидата) подписывается в access-токене вместе
+с версией claims (cv). Версия хранится в CustomUser.claims_version и
+увеличивается при изменении роли, поэтому claims устаревших токенов не
+используются, а роль берется из БД.
+"""
+from django.db.models import F
+
+from .models import CustomUser
+from .user_cache import user_cache, user_role
+
+
+class Principal:
+    __slots__ = ('user_id', 'hr_id', 'company_id', 'candidate_id')
+
+    def __init__(self, user_id, hr_id=None, company_id=None, candidate_id=None):
+        self.user_id = user_id
+        self.hr_id = hr_id
+        self.company_id = company_id
+        self.candidate_id = candidate_id
+
+    def __repr__(self):
+        return f'<Principal user={self.user_id} role={self.role}>'
+
+    @property
+    def role(self):
+        if self.hr_id is not None:
+            return 'hr'
+        if self.candidate_id is not None:
+            return 'candidate'
+        return None
+
+    @classmethod
+    def from_claims(cls, payload):
+        return cls(payload['id'], payload.get('hr_id'), payload.get('company_id'), payload.get('candidate_id'))
+
+    @classmethod
+    def from_user(cls, user):
+        """По роли, загруженной вместе с пользователем в кэш аутентификации."""
+        return cls(user.pk, *user.role)
+
+    def claims(self):
+        return {
+            'role': self.role,
+            'hr_id': self.hr_id,
+            'company_id': self.company_id,
+            'candidate_id': self.candidate_id,
+        }
+
+
+ANONYMOUS = Principal(None)
+
+
+def token_claims(user_id):
+    """Claims роли для нового access-токена по актуальным данным из БД."""
+    user = user_cache.load(user_id)
+    if user is None:
+        return {}
+    return dict(Principal.from_user(user).claims(), cv=user.claims_version)
+
+
+def resolve_principal(user, payload):
+    """
+    Principal для пользователя из кэша и расшифрованного токена.
+
+    Claims используются, если их версия совпадает с версией пользователя. Токен
+    новее записи в кэше процесса означает, что роль менялась — запись
+    перечитывается из БД.
+    """
+    version = payload.get('cv')
+    if version is not None and version > user.claims_version:
+        user = user_cache.load(user.pk) or user
+    if version == user.claims_version:
+        return user, Principal.from_claims(payload)
+    return user, Principal.from_user(user)
+
+
+def get_principal(user):
+    """Principal текущего пользователя; для входа не по JWT роль берется через кэш аутентификации."""
+    principal = getattr(user, 'principal', None)
+    if principal is None:
+        if user is None or user.pk is None:
+            return ANONYMOUS
+        principal = Principal(user.pk, *user_role(user))
+        user.principal = principal
+    return principal
+
+
+def bump_claims_version(user_id):
+    """Делает устаревшими claims роли во всех выданных токенах пользователя."""
+    CustomUser.objects.filter(pk=user_id).update(claims_version=F('claims_version') + 1)
+    user_cache.invalidate(user_id)
@@ -3,7 +3,6 @@ from django.contrib.auth import authenticate
 from rest_framework import serializers
 
 from .models import CustomUser, RefreshToken
-from .token_generators import generate_rt
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -22,14 +21,10 @@ class RegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = CustomUser.objects.create_user(**validated_data)
-        token = RefreshToken.objects.create(
-            token=generate_rt(),
-            user=user
-        )
         return {
             'email': user.email,
             'access_token': user.access_token,
-            'refresh_token': token.token
+            'refresh_token': RefreshToken.issue(user)
         }
 
 
@@ -62,15 +57,10 @@ class LoginSerializer(serializers.Serializer):
                 'A user with this email and password was not found'
             )
 
-        token = RefreshToken.objects.create(
-            token=generate_rt(),
-            user=user
-        )
-
         return {
             "email": email,
             'access_token': user.access_token,
-            'refresh_token': token.token
+            'refresh_token': RefreshToken.issue(user)
         }
 
 
@@ -1,3 +1,160 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .backends import JWTAuthentication
+from .models import CustomUser, RefreshToken
+from .principal import bump_claims_version
+from .user_cache import NO_ROLE, user_cache
+
+
+class UserCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='user@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        # Выпуск токена читает роль через кэш, поэтому кэш очищается после него
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.user.access_token}')
+        user_cache.clear()
+
+    def test_authentication_is_cached(self):
+        self.client.get('/api/maturity-questions/')
+        with self.assertNumQueries(1):  # только сами вопросы
+            response = self.client.get('/api/maturity-questions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_fresh_instance_per_call(self):
+        first, second = user_cache.get(self.user.pk), user_cache.get(self.user.pk)
+        self.assertIsNot(first, second)
+        self.assertEqual((first.pk, first.email, first.role), (self.user.pk, self.user.email, NO_ROLE))
+
+    def test_invalidated_on_save_and_delete(self):
+        user_cache.get(self.user.pk)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(user_cache.get(self.user.pk).is_staff)
+        self.user.delete()
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+    def test_ttl(self):
+        with mock.patch('authorization.user_cache.time.monotonic', return_value=1000.0):
+            user_cache.get(self.user.pk)
+        with mock.patch('authorization.user_cache.time.monotonic', return_value=1000.0 + user_cache.ttl + 1):
+            with self.assertNumQueries(1):
+                user_cache.get(self.user.pk)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_bounded(self):
+        users = [self.user] + [CustomUser.objects.create(email=f'user{i}@example.com') for i in range(2)]
+        for user in users:
+            user_cache.get(user.pk)
+        self.assertEqual(user_cache.stats()['size'], 2)
+        with self.assertNumQueries(1):
+            user_cache.get(self.user.pk)  # вытеснен как давно не использованный
+
+
+class PrincipalClaimsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='user@example.com')
+
+    def setUp(self):
+        user_cache.clear()
+
+    def authenticate(self, token):
+        return JWTAuthentication()._authenticate_credentials(token)[0].principal
+
+    def claims(self, token):
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+
+    def test_token_carries_claims(self):
+        claims = self.claims(self.user.access_token)
+        self.assertEqual(
+            {key: claims[key] for key in ('id', 'role', 'hr_id', 'company_id', 'candidate_id', 'cv')},
+            {'id': self.user.pk, 'role': None, 'hr_id': None, 'company_id': None, 'candidate_id': None, 'cv': 0},
+        )
+
+    def test_principal_from_claims_without_queries(self):
+        token = self.user.access_token
+        forged = jwt.encode(dict(self.claims(token), company_id=42, hr_id=7), settings.SECRET_KEY, algorithm='HS256')
+        with self.assertNumQueries(0):
+            principal = self.authenticate(forged)
+        self.assertEqual((principal.role, principal.company_id), ('hr', 42))
+
+    def test_stale_claims_fall_back_to_lookup(self):
+        token = jwt.encode(
+            dict(self.claims(self.user.access_token), company_id=42, hr_id=7), settings.SECRET_KEY, algorithm='HS256',
+        )
+        bump_claims_version(self.user.pk)
+        principal = self.authenticate(token)
+        self.assertEqual((principal.role, principal.company_id), (None, None))
+
+    def test_stale_save_keeps_claims_version(self):
+        stale = user_cache.get(self.user.pk)
+        token = jwt.encode(
+            dict(self.claims(self.user.access_token), company_id=42, hr_id=7), settings.SECRET_KEY, algorithm='HS256',
+        )
+        bump_claims_version(self.user.pk)
+        stale.email = 'renamed@example.com'
+        stale.save()
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).claims_version, 1)
+        user_cache.clear()
+        principal = self.authenticate(token)
+        self.assertEqual((principal.role, principal.company_id), (None, None))
+
+    def test_token_newer_than_cache_reloads(self):
+        user_cache.get(self.user.pk)
+        CustomUser.objects.filter(pk=self.user.pk).update(claims_version=5)  # в другом процессе
+        token = jwt.encode(
+            dict(self.claims(self.user.access_token), candidate_id=3), settings.SECRET_KEY, algorithm='HS256',
+        )
+        self.assertEqual(self.claims(token)['cv'], 5)
+        self.assertEqual(self.authenticate(token).candidate_id, 3)
+
+
+class RefreshTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='user@example.com', password='password123')
+
+    def login(self):
+        response = self.client.post('/api/user/login/', {'email': 'user@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['refresh_token']
+
+    def test_stored_hashed_and_refreshed(self):
+        token = self.login()
+        self.assertFalse(RefreshToken.objects.filter(token_hash=token).exists())
+        with self.assertNumQueries(1):
+            self.assertEqual(RefreshToken.find(token).user, self.user)
+
+        response = self.client.post('/api/user/refresh/', {'refresh_token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(RefreshToken.find(token))
+        self.assertIsNotNone(RefreshToken.find(response.data['refresh_token']))
+        self.assertEqual(self.client.post('/api/user/refresh/', {'refresh_token': token}).status_code, 400)
+
+    @override_settings(REFRESH_TOKENS_PER_USER=3)
+    def test_cap_per_user(self):
+        tokens = [self.login() for _ in range(5)]
+        self.assertEqual(RefreshToken.objects.filter(user=self.user).count(), 3)
+        self.assertEqual([RefreshToken.find(token) is not None for token in tokens], [False, False, True, True, True])
+
+    def test_purge(self):
+        for _ in range(5):
+            RefreshToken.issue(self.user)
+        RefreshToken.objects.filter(pk__in=list(RefreshToken.objects.values_list('pk', flat=True)[:3])).update(
+            expires='2000-01-01T00:00:00Z',
+        )
+        out = StringIO()
+        call_command('purge_refresh_tokens', batch_size=2, stdout=out)
+        self.assertEqual(RefreshToken.objects.count(), 2)
+        self.assertIn('3', out.getvalue())
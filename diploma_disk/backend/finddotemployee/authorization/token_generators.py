@@ -5,7 +5,8 @@ from django.conf import settings
 import jwt
 
 
-def generate_jwt(pk):
+def generate_jwt(pk, claims=None):
+    """Access-токен с id пользователя и дополнительными claims (роль и ее версия)."""
     dt = datetime.datetime.now(tz=pytz.timezone('Europe/Moscow')) + datetime.timedelta(
         seconds=settings.ACCESS_TOKEN_LIFETIME['seconds'],
         minutes=settings.ACCESS_TOKEN_LIFETIME['minutes'],
@@ -13,6 +14,7 @@ def generate_jwt(pk):
         days=settings.ACCESS_TOKEN_LIFETIME['days']
     )
     token = jwt.api_jwt.encode({
+        **(claims or {}),
         'id': pk,
         'exp': dt,
     }, settings.SECRET_KEY, algorithm='HS256')
@@ -0,0 +1,121 @@
+"""
+Кэш пользователей и их ролей для JWTAuthentication внутри процесса.
+
+Запись содержит поля CustomUser и роль (id HR и компании или id кандидата).
+Кэш ограничен по размеру (вытесняются давно не использованные записи) и по
+времени жизни записи. Сигналы сбрасывают записи при изменении CustomUser, HR
+и Candidate в текущем процессе; в остальных процессах устаревшая запись живет
+не дольше AUTH_USER_CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import CustomUser
+
+Role = namedtuple('Role', ['hr_id', 'company_id', 'candidate_id'])
+NO_ROLE = Role(None, None, None)
+
+
+class UserCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+    def get(self, user_id):
+        """
+        Пользователь с атрибутом role или None, если такого пользователя нет.
+
+        Каждый вызов возвращает новый объект CustomUser, поэтому кэш связей,
+        заполненный во время одного запроса, не попадает в другие.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+            generation = self._generation
+
+        if entry is None:
+            row = self._load(user_id)
+            if row is None:
+                return None
+            entry = (now + self.ttl,) + row
+            with self._lock:
+                # Запись, прочитанная до сброса, уже может быть устаревшей
+                if generation == self._generation:
+                    self._entries[user_id] = entry
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+
+        _, field_names, values, role = entry
+        user = CustomUser.from_db(CustomUser.objects.db, field_names, values)
+        user.role = role
+        return user
+
+    def load(self, user_id):
+        """Как get, но всегда читает пользователя из БД и обновляет запись."""
+        self.invalidate(user_id)
+        return self.get(user_id)
+
+    @staticmethod
+    def _load(user_id):
+        """Поля пользователя и его роль одним запросом."""
+        field_names = [field.attname for field in CustomUser._meta.concrete_fields]
+        row = (
+            CustomUser.objects.filter(pk=user_id)
+            .values_list(*field_names, 'hr__id', 'hr__company_id', 'candidate__id')
+            .first()
+        )
+        if row is None:
+            return None
+        return field_names, row[:len(field_names)], Role(*row[len(field_names):])
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Счетчики попаданий и промахов и текущий размер кэша."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+user_cache = UserCache()
+
+
+def user_role(user):
+    """Роль пользователя: из кэша аутентификации, а для остальных способов входа — через кэш по id."""
+    role = getattr(user, 'role', None)
+    if role is None:
+        if user is None or user.pk is None:
+            return NO_ROLE
+        cached = user_cache.get(user.pk)
+        role = cached.role if cached is not None else NO_ROLE
+        user.role = role
+    return role
@@ -13,7 +13,6 @@ from rest_framework.views import APIView
 from .models import CustomUser, RefreshToken
 from .serializers import RegistrationSerializer, LoginSerializer, CustomUserSerializer
 from .renderers import CustomUserJSONRenderer
-from .token_generators import generate_rt, generate_jwt
 
 
 # Create your views here.
@@ -43,23 +42,17 @@ class RefreshAPIView(APIView):
         }
     )
     def post(self, request):
-        try:
-            refresh_token = request.data.get('refresh_token')
-            old_token = RefreshToken.objects.get(token=refresh_token)
-            user = old_token.user
-        except RefreshToken.DoesNotExist:
+        old_token = RefreshToken.find(request.data.get('refresh_token'))
+        if old_token is None:
             return Response({
                 'error': 'Token is not valid'
             }, status=status.HTTP_400_BAD_REQUEST)
+        user = old_token.user
         if not old_token.used and old_token.expires > datetime.now(tz=timezone(settings.TIME_ZONE)):
-            token = RefreshToken.objects.create(
-                token=generate_rt(),
-                user=user
-            )
             old_token.delete()
             data = {
-                'access_token': generate_jwt(user.pk),
-                'refresh_token': token.token
+                'access_token': user.access_token,
+                'refresh_token': RefreshToken.issue(user)
             }
             return Response(data, status=status.HTTP_200_OK)
         else:
@@ -0,0 +1,219 @@
+"""
+Метрики запросов: время и число SQL-запросов, время представления, рендеринга
+и подбора кандидатов.
+
+RequestMetricsMiddleware отдает их в заголовке Server-Timing и копит гистограммы
+по маршрутам, которые MetricsView отдает staff-пользователям в формате Prometheus.
+Замеры внутри запроса (RequestTimings, timed) — в finddotemployee.timing.
+Счетчики живут в памяти процесса (как user_cache), каждый воркер отдает свои.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authorization.user_cache import user_cache
+
+from .timing import RequestTimings, _current
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{format_labels(self.labels, labels)} {value}')
+        return lines
+
+
+class MetricsRegistry:
+    """Гистограммы и счетчики запросов по маршрутам, потокобезопасно."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.duration = Histogram(
+                'http_request_duration_seconds', 'Время обработки запроса.', ('route', 'method'), DURATION_BUCKETS,
+            )
+            self.db_duration = Histogram(
+                'http_request_db_duration_seconds', 'Суммарное время SQL-запросов за запрос.', ('route', 'method'),
+                DURATION_BUCKETS,
+            )
+            self.db_queries = Histogram(
+                'http_request_db_queries', 'Число SQL-запросов за запрос.', ('route', 'method'), QUERY_BUCKETS,
+            )
+            self.stages = Counter(
+                'http_request_stage_seconds_total', 'Время по этапам: view, render и участки вроде match.',
+                ('route', 'stage'),
+            )
+            self.responses = Counter(
+                'http_responses_total', 'Ответы по кодам статуса.', ('route', 'method', 'status'),
+            )
+
+    def observe(self, route, method, status, total, timings, stages):
+        with self._lock:
+            self.duration.observe((route, method), total)
+            self.db_duration.observe((route, method), timings.db)
+            self.db_queries.observe((route, method), timings.queries)
+            for stage, seconds in stages.items():
+                self.stages.inc((route, stage), seconds)
+            self.responses.inc((route, method, str(status)))
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.duration, self.db_duration, self.db_queries, self.stages, self.responses):
+                lines += metric.render()
+        stats = user_cache.stats()
+        lines += [
+            '# HELP auth_user_cache_hits_total Попадания в кэш пользователей аутентификации.',
+            '# TYPE auth_user_cache_hits_total counter',
+            f"auth_user_cache_hits_total {stats['hits']}",
+            '# HELP auth_user_cache_misses_total Промахи кэша пользователей аутентификации.',
+            '# TYPE auth_user_cache_misses_total counter',
+            f"auth_user_cache_misses_total {stats['misses']}",
+            '# HELP auth_user_cache_size Пользователей в кэше аутентификации.',
+            '# TYPE auth_user_cache_size gauge',
+            f"auth_user_cache_size {stats['size']}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(total, timings, stages):
+    """Значение заголовка Server-Timing, длительности в миллисекундах."""
+    entries = [f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"']
+    entries += [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in stages.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет запрос целиком, SQL через execute_wrapper, представление и рендеринг.
+
+    Представление — от process_view до process_template_response, рендеринг — от него до
+    возврата ответа. У потоковых ответов учитывается только время до начала передачи тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        end = time.perf_counter()
+
+        stages = {}
+        view_start = getattr(request, '_metrics_view_start', None)
+        if view_start is not None:
+            view_end = getattr(request, '_metrics_view_end', end)
+            stages['view'] = view_end - view_start
+            if view_end != end:
+                stages['render'] = end - view_end
+        stages.update(timings.spans)
+
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        registry.observe(route, request.method, response.status_code, end - start, timings, stages)
+        response['Server-Timing'] = server_timing(end - start, timings, stages)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после возврата из представления, здесь оно уже отработало
+        request._metrics_view_end = time.perf_counter()
+        return response
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, str):
+            # Ошибки доступа приходят словарем {'detail': ...}
+            data = str((data or {}).get('detail', ''))
+        return data.encode(self.charset)
+
+
+class MetricsView(APIView):
+    """Метрики процесса в текстовом формате Prometheus, только для staff."""
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
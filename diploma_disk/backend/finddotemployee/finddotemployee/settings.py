@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'finddotemployee.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -182,3 +183,13 @@ REFRESH_TOKEN_LIFETIME = {
     'hours': 0,
     'days': 30
 }
+
+# lifetime of the cached ProfileView payload, seconds (entries are also dropped by version bumps)
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# per-process cache of authenticated users and their roles
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 60
+
+# active refresh tokens kept per user, older ones are deleted on login
+REFRESH_TOKENS_PER_USER = 10
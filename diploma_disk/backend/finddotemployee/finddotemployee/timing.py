@@ -0,0 +1,58 @@
+"""
+Замеры внутри запроса: время и число SQL-запросов и именованных участков.
+
+Модуль без зависимостей от приложений, его можно импортировать из моделей,
+сервисов и миграций. Метрики по маршрутам собирает finddotemployee.metrics.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Накопленные за один запрос время SQL, число запросов и замеры именованных участков."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        self._depth = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: вызывается на каждый SQL-запрос
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    @contextmanager
+    def span(self, name):
+        # Вложенные вызовы одного участка учитываются один раз, по внешнему
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if not depth:
+                self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def timed(name):
+    """Декоратор: время функции попадает в метрики текущего запроса как участок name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            with timings.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
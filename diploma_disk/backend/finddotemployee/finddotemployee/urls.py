@@ -23,6 +23,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from .metrics import MetricsView
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -39,6 +41,7 @@ schema_view = get_schema_view(
 api_urls = [
     path('user/', include('authorization.urls')),
     path('', include('finder.urls')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 urlpatterns = [
@@ -14,7 +14,8 @@ class CompanyAdmin(admin.ModelAdmin):
 
 @admin.register(Candidate)
 class CandidateAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'age', 'user')
+    list_display = ('full_name', 'age', 'user', 'digital_maturity')
+    list_select_related = ('user',)
     search_fields = ('full_name', 'user__email')
 
 
@@ -32,8 +33,9 @@ class ExperienceAdmin(admin.ModelAdmin):
 
 @admin.register(Resume)
 class ResumeAdmin(admin.ModelAdmin):
-    list_display = ('candidate', 'is_active', 'digital_maturity_score')
+    list_display = ('candidate', 'is_active', 'digital_maturity')
     list_filter = ('is_active',)
+    list_select_related = ('candidate',)
 
 
 @admin.register(Vacancy)
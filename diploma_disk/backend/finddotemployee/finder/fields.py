@@ -0,0 +1,106 @@
+"""
+Поля сериализаторов для списков ссылок на объекты.
+
+DRF проверяет каждый id в PrimaryKeyRelatedField(many=True) и во вложенных
+сериализаторах с many=True отдельным запросом, здесь весь список загружается
+одним запросом id__in.
+"""
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def resolve_pks(queryset, pks):
+    """
+    Загружает объекты по списку id одним запросом.
+
+    Returns:
+        dict: {id: объект}.
+
+    Raises:
+        ValidationError: Со всеми отсутствующими id в одном сообщении.
+    """
+    pks = set(pks)
+    objects = queryset.in_bulk(pks)
+    missing = sorted(pks - objects.keys())
+    if missing:
+        raise serializers.ValidationError(f"Объекты не найдены: {', '.join(map(str, missing))}")
+    return objects
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список ссылок, проверяемый одним запросом; порядок и повторы id сохраняются."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = [self.child_relation.to_pk(item) for item in data]
+        objects = resolve_pks(self.child_relation.get_queryset(), pks)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True загружает все объекты одним запросом.
+
+    Во вложенном сериализаторе со списком BulkRelatedListSerializer объекты всех
+    элементов загружаются заранее, а ошибка отсутствующего id остается у элемента.
+    """
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            return self.preloaded[self.to_pk(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        """Приводит значение к типу первичного ключа без запроса к БД."""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """Список вложенных объектов, ссылки BulkPrimaryKeyRelatedField в котором загружаются одним запросом на поле."""
+
+    def to_internal_value(self, data):
+        fields = [
+            field for field in self.child.fields.values()
+            if isinstance(field, BulkPrimaryKeyRelatedField) and not field.read_only
+        ]
+        if isinstance(data, list):
+            for field in fields:
+                pks = set()
+                for item in data:
+                    if isinstance(item, Mapping) and item.get(field.field_name) is not None:
+                        try:
+                            pks.add(field.to_pk(item[field.field_name]))
+                        except serializers.ValidationError:
+                            pass  # Ошибку типа покажет проверка элемента
+                field.preloaded = field.get_queryset().in_bulk(pks)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.preloaded = None
@@ -0,0 +1,62 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finder.models import (
+    Company, CompanyMaturityAnswer, MaturityQuestion,
+    recalculate_companies_maturity, recalculate_company_maturity,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пересчет индекса цифровой зрелости по одной компании и одним запросом '
+        'на синтетических данных. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=10000, help='Число компаний.')
+        parser.add_argument('--questions', type=int, default=20, help='Число вопросов анкеты.')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора ответов.')
+
+    def handle(self, *args, companies, questions, seed, **options):
+        rng = random.Random(seed)
+        with transaction.atomic():
+            question_objs = MaturityQuestion.objects.bulk_create(
+                [MaturityQuestion(text=f'Вопрос {i}', weight=rng.choice([0.5, 1.0, 2.0])) for i in range(questions)]
+            )
+            company_objs = Company.objects.bulk_create(
+                [Company(name=f'Компания {i}', maturity_level=0) for i in range(companies)], batch_size=1000
+            )
+            CompanyMaturityAnswer.objects.bulk_create(
+                [
+                    CompanyMaturityAnswer(company=company, question=question, answer_value=rng.random())
+                    for company in company_objs
+                    for question in question_objs
+                ],
+                batch_size=2000,
+            )
+
+            start = time.perf_counter()
+            for company in company_objs:
+                recalculate_company_maturity(company)
+            per_company = time.perf_counter() - start
+            created = Company.objects.filter(pk__gte=company_objs[0].pk)
+            expected = dict(created.values_list('pk', 'maturity_level'))
+
+            # Уровни сбрасываются, чтобы пересчет одним запросом действительно их записал
+            created.update(maturity_level=0)
+            start = time.perf_counter()
+            recalculate_companies_maturity(created.values('pk'))
+            bulk = time.perf_counter() - start
+            actual = dict(created.values_list('pk', 'maturity_level'))
+
+            transaction.set_rollback(True)
+
+        mismatches = sum(1 for pk, level in expected.items() if actual[pk] != level)
+        self.stdout.write(f'Компаний: {companies}, вопросов: {questions}')
+        self.stdout.write(f'По одной компании: {per_company:.3f} с')
+        self.stdout.write(f'Одним запросом: {bulk:.3f} с')
+        self.stdout.write(f'Расхождений: {mismatches}')
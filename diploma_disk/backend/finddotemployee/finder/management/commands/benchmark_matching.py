@@ -0,0 +1,206 @@
+import json
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from authorization.models import CustomUser
+from finder.models import Candidate, CandidateVacancyScore, Vacancy
+from finder.services import fill_match_scores
+from finder.synthetic import TIERS, generate_dataset
+from finder.utils import calculate_match_score
+
+
+def percentile(values, p):
+    """Перцентиль p (0–100) методом ближайшего ранга."""
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class Benchmark:
+    """
+    Замеры горячих путей подбора на готовом наборе данных (см. synthetic.generate_dataset).
+
+    Запросы к API проходят весь стек Django вместе с JWT-аутентификацией. Для каждого
+    вызова сохраняются время и число SQL-запросов; подготовка аргументов не замеряется.
+    """
+
+    def __init__(self, dataset, repeat=50, seed=0):
+        self.dataset = dataset
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+        self.client = APIClient()
+        self.tokens = {}
+        self.results = []
+
+    def login(self, user_ids):
+        """Выпускает токены заранее, чтобы их генерация не попадала в замеры."""
+        for user in CustomUser.objects.filter(pk__in=set(user_ids) - self.tokens.keys()):
+            self.tokens[user.pk] = user.access_token
+
+    def auth(self, user_id):
+        return {'HTTP_AUTHORIZATION': f'Token {self.tokens[user_id]}'}
+
+    def measure(self, name, call, arguments, prepare=None, expected_status=200):
+        """Вызывает call для каждого аргумента (после prepare) и сохраняет перцентили времени и число запросов."""
+        timings, queries = [], []
+        for argument in arguments:
+            if prepare is not None:
+                argument = prepare(argument)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                result = call(argument)
+                elapsed = time.perf_counter() - start
+            status = getattr(result, 'status_code', None)
+            if status is not None and status != expected_status:
+                raise CommandError(f'{name}: ответ {status} вместо {expected_status}')
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+        self.results.append({
+            'name': name,
+            'runs': len(timings),
+            'p50_ms': percentile(timings, 50),
+            'p90_ms': percentile(timings, 90),
+            'p99_ms': percentile(timings, 99),
+            'max_ms': max(timings),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+        })
+
+    def sample(self, ids, count=None):
+        return self.rng.sample(ids, min(count or self.repeat, len(ids)))
+
+    def run(self):
+        cache.clear()
+        self.match_score()
+        self.recommend_candidates()
+        self.candidate_list()
+        self.profile()
+        self.submit_maturity_answers()
+        return self.results
+
+    def match_score(self):
+        pairs = list(zip(
+            [self.rng.choice(self.dataset['candidate_user_ids']) for _ in range(self.repeat)],
+            [self.rng.choice(self.dataset['vacancy_ids']) for _ in range(self.repeat)],
+        ))
+
+        def load(pair, cached=False):
+            candidate = Candidate.objects.get(user_id=pair[0])
+            vacancy = Vacancy.objects.get(pk=pair[1])
+            CandidateVacancyScore.objects.filter(candidate=candidate, vacancy=vacancy).delete()
+            if cached:
+                # calculate_match_score только читает кэш, строку сохраняет fill_match_scores
+                fill_match_scores(vacancy, Candidate.objects.filter(pk=candidate.pk))
+            return candidate, vacancy
+
+        call = lambda objects: calculate_match_score(*objects)
+        self.measure('calculate_match_score', call, pairs, prepare=load)
+        self.measure('calculate_match_score (из кэша)', call, pairs, prepare=lambda pair: load(pair, cached=True))
+
+    def recommend_candidates(self):
+        vacancy_ids = self.sample(self.dataset['vacancy_ids'])
+        hr = self.rng.choice(self.dataset['hr_user_ids'])
+        self.login([hr])
+
+        def call(params):
+            vacancy_id, query = params
+            return self.client.get(f'/api/recommendations/resumes/{vacancy_id}/', query, **self.auth(hr))
+
+        # Первый запрос по вакансии досчитывает компоненты баллов, повторный читает их из кэша
+        self.measure('RecommendCandidatesView', call, [(pk, {}) for pk in vacancy_ids])
+        self.measure('RecommendCandidatesView (повтор)', call, [(pk, {}) for pk in vacancy_ids])
+        filters = {'min_score': 0.3, 'min_maturity': 2, 'active_resume': 1}
+        self.measure('RecommendCandidatesView (фильтры)', call, [(pk, filters) for pk in vacancy_ids])
+
+    def candidate_list(self):
+        staff = self.dataset['staff_user_id']
+        pages = math.ceil(len(self.dataset['candidate_user_ids']) / 25)
+        self.login([staff])
+        self.measure(
+            'CandidateViewSet.list',
+            lambda page: self.client.get('/api/candidates/', {'page': page}, **self.auth(staff)),
+            [self.rng.randint(1, pages) for _ in range(self.repeat)],
+        )
+
+    def profile(self):
+        user_ids = self.sample(self.dataset['candidate_user_ids'])
+        self.login(user_ids)
+        etags = {}
+
+        def call(user_id, headers=None):
+            response = self.client.get('/api/profile/', **self.auth(user_id), **(headers or {}))
+            etags[user_id] = response['ETag']
+            return response
+
+        self.measure('ProfileView', call, user_ids)
+        self.measure('ProfileView (из кэша)', call, user_ids)
+        self.measure(
+            'ProfileView (If-None-Match)',
+            lambda user_id: call(user_id, {'HTTP_IF_NONE_MATCH': etags[user_id]}),
+            user_ids,
+            expected_status=304,
+        )
+
+    def submit_maturity_answers(self):
+        questions = self.dataset['question_ids']
+        hrs = [self.rng.choice(self.dataset['hr_user_ids']) for _ in range(self.repeat)]
+        self.login(hrs)
+        self.measure(
+            'SubmitCompanyMaturityAnswers',
+            lambda hr: self.client.post(
+                '/api/digital-maturity/submit/',
+                [{'question_id': pk, 'answer_value': round(self.rng.random(), 3)} for pk in questions],
+                format='json', **self.auth(hr),
+            ),
+            hrs,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет горячие пути подбора (calculate_match_score, рекомендации, список кандидатов, профиль, '
+        'анкета зрелости) на синтетических данных. Данные создаются в отдельной тестовой БД, '
+        'которая удаляется после замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tier', choices=list(TIERS), default='1k', help='Размер набора данных.')
+        parser.add_argument('--candidates', type=int, help='Число кандидатов вместо уровня --tier.')
+        parser.add_argument('--repeat', type=int, default=50, help='Вызовов каждого сценария.')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора данных и выборок.')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл.')
+
+    def handle(self, *args, tier, candidates, repeat, seed, json_path, **options):
+        size = candidates or TIERS[tier]
+        old_name = connection.settings_dict['NAME']
+        # Тестовая БД создается заново: замеры не трогают рабочие данные, а on_commit выполняются как в проде
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            dataset = generate_dataset(size, seed)
+            self.stdout.write(f'Кандидатов: {size}, вакансий: {len(dataset["vacancy_ids"])}, '
+                              f'данные созданы за {time.perf_counter() - start:.1f} с')
+            results = Benchmark(dataset, repeat, seed).run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(f'{"Сценарий":<36} {"N":>4} {"p50, мс":>9} {"p90, мс":>9} {"p99, мс":>9} '
+                          f'{"max, мс":>9} {"запросов":>9}')
+        for result in results:
+            queries = result['queries_min']
+            if result['queries_max'] != queries:
+                queries = f'{queries}–{result["queries_max"]}'
+            self.stdout.write(
+                f'{result["name"]:<36} {result["runs"]:>4} {result["p50_ms"]:>9.1f} {result["p90_ms"]:>9.1f} '
+                f'{result["p99_ms"]:>9.1f} {result["max_ms"]:>9.1f} {queries:>9}'
+            )
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'candidates': size, 'repeat': repeat, 'seed': seed, 'results': results}, f,
+                          ensure_ascii=False, indent=2)
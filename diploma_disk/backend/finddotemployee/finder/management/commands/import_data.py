@@ -0,0 +1,267 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from authorization.models import CustomUser
+from finder.models import (
+    Candidate, CandidateSkill, Company, Resume, Skill, Vacancy, VacancySkill,
+    candidate_maturity_fields, update_search_vectors,
+)
+from finder.utils import context_maturity_level
+
+
+def read_records(stream, fmt):
+    """Построчно читает записи CSV или JSONL: (номер строки, словарь)."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+
+
+def parse_skill_ranks(value):
+    """Навыки кандидата: {"Python": 4} в JSONL или «Python:4;SQL:3» в CSV."""
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = (item.rsplit(':', 1) for item in (value or '').split(';') if item.strip())
+    ranks = {}
+    for title, rank in items:
+        rank = int(rank)
+        if not 1 <= rank <= 5:
+            raise ValueError(f'уровень навыка {title} вне диапазона 1–5')
+        ranks[title.strip()] = rank
+    return ranks
+
+
+def parse_skill_titles(value):
+    """Навыки вакансии: список в JSONL или «Python;SQL» в CSV."""
+    if isinstance(value, list):
+        return [title.strip() for title in value]
+    return [title.strip() for title in (value or '').split(';') if title.strip()]
+
+
+def required(record, key, model, field=None):
+    """Непустое строковое значение, не длиннее поля модели."""
+    value = (record[key] or '').strip()
+    if not value:
+        raise ValueError(f'пустое поле {key}')
+    max_length = model._meta.get_field(field or key).max_length
+    if max_length and len(value) > max_length:
+        raise ValueError(f'поле {key} длиннее {max_length} символов')
+    return value
+
+
+def parse_age(value):
+    age = int(value)
+    if age < 0:
+        raise ValueError('отрицательный возраст')
+    return age
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes')
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт навыков, кандидатов или вакансий из CSV/JSONL. Строки читаются частями, '
+        'каждая часть пишется массовыми INSERT в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['skills', 'candidates', 'vacancies'])
+        parser.add_argument('path', help='Файл CSV или JSONL, «-» — стандартный ввод.')
+        parser.add_argument(
+            '--format', dest='fmt', choices=['csv', 'jsonl'], help='По умолчанию — по расширению файла.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Строк в одной транзакции.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Строк в одном INSERT.')
+
+    def handle(self, *args, kind, path, fmt, chunk_size, batch_size, **options):
+        fmt = fmt or ('csv' if path.endswith('.csv') else 'jsonl')
+        self.batch_size = batch_size
+        # Таблицы «название → id» держатся в памяти, строки файла — нет
+        self.skills = {title: (pk, weight) for title, pk, weight in Skill.objects.order_by('-id').values_list(
+            'title', 'id', 'weight',
+        )}
+        self.company_ids = dict(Company.objects.order_by('-id').values_list('name', 'id'))
+        import_chunk = getattr(self, f'import_{kind}')
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть {path}: {e}')
+        imported = skipped = 0
+        start = time.monotonic()
+        try:
+            records = read_records(stream, fmt)
+            while chunk := list(islice(records, chunk_size)):
+                with transaction.atomic():
+                    count, errors = import_chunk(chunk)
+                imported += count
+                skipped += len(errors)
+                for line_no, error in errors:
+                    self.stderr.write(f'Строка {line_no}: {error}')
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f'{kind}: импортировано {imported}, пропущено {skipped}, {imported / max(elapsed, 1e-9):.0f} строк/с'
+                )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(f'Готово за {time.monotonic() - start:.1f} с: импортировано {imported}, пропущено {skipped}')
+
+    def parse(self, chunk, parse_record):
+        """Разбирает строки части: ([(номер строки, запись)], [(номер строки, ошибка)])."""
+        rows, errors = [], []
+        for line_no, record in chunk:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                rows.append((line_no, parse_record(record)))
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                errors.append((line_no, f'{type(e).__name__}: {e}'))
+        return rows, errors
+
+    def resolve_skills(self, titles):
+        """Пары (id, вес) навыков по названиям."""
+        unknown = [title for title in titles if title not in self.skills]
+        if unknown:
+            raise ValueError(f"неизвестные навыки: {', '.join(unknown)}")
+        return [self.skills[title] for title in titles]
+
+    def import_skills(self, chunk):
+        rows, errors = self.parse(chunk, lambda record: Skill(
+            title=required(record, 'title', Skill), description=record.get('description') or '',
+            weight=float(record['weight']),
+        ))
+        skills = []
+        for line_no, skill in rows:
+            if skill.title in self.skills or skill.title in {s.title for s in skills}:
+                errors.append((line_no, f'навык {skill.title} уже есть'))
+                continue
+            skills.append(skill)
+        Skill.objects.bulk_create(skills, batch_size=self.batch_size)
+        self.skills.update((skill.title, (skill.pk, skill.weight)) for skill in skills)
+        return len(skills), errors
+
+    def import_candidates(self, chunk):
+        rows, errors = self.parse(chunk, lambda record: {
+            'email': required(record, 'email', CustomUser),
+            'full_name': required(record, 'full_name', Candidate),
+            'age': parse_age(record['age']),
+            'about': record.get('about') or '',
+            'skills': parse_skill_ranks(record.get('skills')),
+            'active_resume': parse_bool(record.get('active_resume')),
+        })
+        taken = set(CustomUser.objects.filter(email__in=[row['email'] for _, row in rows]).values_list('email', flat=True))
+
+        accepted = []
+        for line_no, row in rows:
+            if row['email'] in taken:
+                errors.append((line_no, f"пользователь {row['email']} уже есть"))
+                continue
+            try:
+                row['skills'] = [
+                    (skill_id, weight, rank)
+                    for (skill_id, weight), rank in zip(self.resolve_skills(list(row['skills'])), row['skills'].values())
+                ]
+            except ValueError as e:
+                errors.append((line_no, str(e)))
+                continue
+            taken.add(row['email'])
+            accepted.append(row)
+
+        users = CustomUser.objects.bulk_create(
+            [CustomUser(email=row['email'], password=make_password(None)) for row in accepted],
+            batch_size=self.batch_size,
+        )
+        # Массовая вставка не отправляет сигналы: агрегаты навыков и зрелость считаются
+        # здесь же по таблице весов, в порядке вставки навыков, как в recalculate_candidate_maturity
+        for row in accepted:
+            row['weighted_sum'] = 0
+            for _, weight, rank in row['skills']:
+                row['weighted_sum'] += weight * (rank / 5.0)
+        candidates = Candidate.objects.bulk_create(
+            [
+                Candidate(
+                    user=user, full_name=row['full_name'], age=row['age'], about=row['about'],
+                    **candidate_maturity_fields(row['weighted_sum'], len(row['skills']), row['active_resume']),
+                )
+                for user, row in zip(users, accepted)
+            ],
+            batch_size=self.batch_size,
+        )
+        CandidateSkill.objects.bulk_create(
+            [
+                CandidateSkill(candidate=candidate, skill_id=skill_id, rank=rank)
+                for candidate, row in zip(candidates, accepted)
+                for skill_id, _, rank in row['skills']
+            ],
+            batch_size=self.batch_size,
+        )
+        Resume.objects.bulk_create(
+            [
+                Resume(candidate=candidate, digital_maturity=context_maturity_level(row['weighted_sum'], len(row['skills'])))
+                for candidate, row in zip(candidates, accepted) if row['active_resume']
+            ],
+            batch_size=self.batch_size,
+        )
+        update_search_vectors([candidate.pk for candidate in candidates])
+        return len(candidates), errors
+
+    def import_vacancies(self, chunk):
+        rows, errors = self.parse(chunk, lambda record: {
+            'title': required(record, 'title', Vacancy),
+            'company': required(record, 'company', Company, 'name'),
+            'description': record.get('description') or '',
+            'skills': parse_skill_titles(record.get('skills')),
+        })
+
+        accepted = []
+        for line_no, row in rows:
+            try:
+                row['skills'] = {skill_id for skill_id, _ in self.resolve_skills(row['skills'])}
+            except ValueError as e:
+                errors.append((line_no, str(e)))
+                continue
+            accepted.append(row)
+
+        new_companies = {row['company'] for row in accepted} - self.company_ids.keys()
+        if new_companies:
+            companies = Company.objects.bulk_create(
+                [Company(name=name, maturity_level=0) for name in sorted(new_companies)], batch_size=self.batch_size,
+            )
+            self.company_ids.update((company.name, company.pk) for company in companies)
+
+        vacancies = Vacancy.objects.bulk_create(
+            [
+                Vacancy(title=row['title'], company_id=self.company_ids[row['company']], description=row['description'])
+                for row in accepted
+            ],
+            batch_size=self.batch_size,
+        )
+        VacancySkill.objects.bulk_create(
+            [
+                VacancySkill(vacancy=vacancy, skill_id=skill_id)
+                for vacancy, row in zip(vacancies, accepted)
+                for skill_id in row['skills']
+            ],
+            batch_size=self.batch_size,
+        )
+        return len(vacancies), errors
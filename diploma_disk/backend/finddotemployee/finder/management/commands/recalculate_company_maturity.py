@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finder.models import CompanyMaturityAnswer, recalculate_companies_maturity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает индекс цифровой зрелости компаний одним запросом (например, после правки весов вопросов).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--question', type=int, action='append', dest='questions', default=[],
+            help='Только компании, ответившие на вопрос с этим id (можно повторять).',
+        )
+
+    def handle(self, *args, questions, **options):
+        company_ids = None
+        if questions:
+            company_ids = CompanyMaturityAnswer.objects.filter(question_id__in=questions).values('company_id')
+        with transaction.atomic():
+            updated = recalculate_companies_maturity(company_ids)
+        self.stdout.write(f'Пересчитано компаний: {updated}')
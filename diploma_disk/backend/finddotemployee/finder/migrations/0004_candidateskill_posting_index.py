@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0003_resume_name_alter_candidateskill_rank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidateskill',
+            index=models.Index(fields=['skill', 'candidate', 'rank'], name='finder_candskill_posting_idx'),
+        ),
+    ]
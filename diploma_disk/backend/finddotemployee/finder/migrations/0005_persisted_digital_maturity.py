@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+def skills_maturity_level(values):
+    # Копия формулы на момент миграции: среднее вес × уровень / 5 переводится в уровень 1–4
+    if not values:
+        return 1
+    score = round(sum(values) / len(values), 9)
+    for level, bound in ((1, 0.25), (2, 0.5), (3, 0.75)):
+        if score <= bound:
+            return level
+    return 4
+
+
+def fill_digital_maturity(apps, schema_editor):
+    Candidate = apps.get_model('finder', 'Candidate')
+    CandidateSkill = apps.get_model('finder', 'CandidateSkill')
+    Resume = apps.get_model('finder', 'Resume')
+
+    skills = {}
+    rows = CandidateSkill.objects.order_by('id').values_list('candidate_id', 'rank', 'skill__weight')
+    for candidate_id, rank, weight in rows:
+        skills.setdefault(candidate_id, []).append(weight * (rank / 5.0))
+    with_active_resume = set(Resume.objects.filter(is_active=True).values_list('candidate_id', flat=True))
+
+    for candidate_id, candidate_skills in skills.items():
+        level = skills_maturity_level(candidate_skills)
+        Resume.objects.filter(candidate_id=candidate_id).update(digital_maturity=level)
+        if candidate_id in with_active_resume:
+            Candidate.objects.filter(id=candidate_id).update(digital_maturity=level)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0004_candidateskill_posting_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='digital_maturity',
+            field=models.PositiveSmallIntegerField(db_index=True, default=1, editable=False, verbose_name='Цифровая зрелость'),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='digital_maturity',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Цифровая зрелость'),
+        ),
+        migrations.RunPython(fill_digital_maturity, migrations.RunPython.noop),
+    ]
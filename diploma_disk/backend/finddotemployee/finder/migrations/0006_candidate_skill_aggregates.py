@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def unmatched_maturity_level(weighted_sum, skill_count):
+    # Копия формулы на момент миграции: зрелость для вакансии без общих навыков,
+    # к среднему добавляется бонус за дополнительные навыки (не больше 0.2)
+    if not skill_count:
+        return 1
+    base_score = weighted_sum / skill_count
+    score = round(min(base_score + min(base_score, 0.2), 1.0), 9)
+    for level, bound in ((1, 0.25), (2, 0.5), (3, 0.75)):
+        if score <= bound:
+            return level
+    return 4
+
+
+def fill_skill_aggregates(apps, schema_editor):
+    Candidate = apps.get_model('finder', 'Candidate')
+    CandidateSkill = apps.get_model('finder', 'CandidateSkill')
+    Resume = apps.get_model('finder', 'Resume')
+
+    totals = {}
+    for candidate_id, rank, weight in CandidateSkill.objects.order_by('id').values_list('candidate_id', 'rank', 'skill__weight'):
+        total = totals.setdefault(candidate_id, [0, 0])
+        total[0] += weight * (rank / 5.0)
+        total[1] += 1
+    with_active_resume = set(Resume.objects.filter(is_active=True).values_list('candidate_id', flat=True))
+
+    candidates = []
+    for candidate in Candidate.objects.all():
+        candidate.skill_weight_sum, candidate.skill_count = totals.get(candidate.id, (0.0, 0))
+        candidate.has_active_resume = candidate.id in with_active_resume
+        if candidate.has_active_resume:
+            candidate.unmatched_maturity = unmatched_maturity_level(candidate.skill_weight_sum, candidate.skill_count)
+        candidates.append(candidate)
+    Candidate.objects.bulk_update(
+        candidates, ['skill_weight_sum', 'skill_count', 'has_active_resume', 'unmatched_maturity'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0005_persisted_digital_maturity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='has_active_resume',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Есть активное резюме'),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='skill_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число навыков'),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='skill_weight_sum',
+            field=models.FloatField(default=0.0, editable=False, verbose_name='Сумма вес × уровень / 5'),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='unmatched_maturity',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Цифровая зрелость для вакансии без общих навыков'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['unmatched_maturity', 'id'], name='finder_candidate_unmatched_idx'),
+        ),
+        migrations.RunPython(fill_skill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0006_candidate_skill_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateVacancyScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill_match_score', models.FloatField(verbose_name='Соответствие навыкам (0–1)')),
+                ('maturity_score', models.FloatField(verbose_name='Цифровая зрелость с учетом вакансии (0–1)')),
+                ('has_overlap', models.BooleanField(default=False, verbose_name='Есть общие навыки')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacancy_scores', to='finder.candidate', verbose_name='Кандидат')),
+                ('vacancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_scores', to='finder.vacancy', verbose_name='Вакансия')),
+            ],
+            options={
+                'verbose_name': 'Релевантность кандидата',
+                'verbose_name_plural': 'Релевантность кандидатов',
+                'indexes': [models.Index(fields=['candidate'], name='finder_cvscore_candidate_idx')],
+                'unique_together': {('vacancy', 'candidate')},
+            },
+        ),
+    ]
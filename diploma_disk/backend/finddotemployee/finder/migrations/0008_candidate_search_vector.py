@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Candidate = apps.get_model('finder', 'Candidate')
+    Experience = apps.get_model('finder', 'Experience')
+    # Копия выражения на момент миграции: A — имя, B — «о себе», C — описания опыта работы
+    experience = (
+        Experience.objects.filter(candidate=OuterRef('pk'))
+        .order_by()
+        .values('candidate')
+        .annotate(text=StringAgg('about', ' ', output_field=models.TextField()))
+        .values('text')
+    )
+    Candidate.objects.update(search_vector=(
+        SearchVector('full_name', weight='A', config='russian')
+        + SearchVector('about', weight='B', config='russian')
+        + SearchVector(Subquery(experience), weight='C', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0007_candidate_vacancy_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='finder_candidate_search_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0008_candidate_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='score_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия релевантности'),
+        ),
+        migrations.AddField(
+            model_name='candidatevacancyscore',
+            name='candidate_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия кандидата'),
+        ),
+        migrations.AddField(
+            model_name='candidatevacancyscore',
+            name='vacancy_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия вакансии'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='score_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия релевантности'),
+        ),
+    ]
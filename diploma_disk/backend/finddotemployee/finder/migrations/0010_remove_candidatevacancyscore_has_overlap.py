@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0009_match_score_versions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='candidatevacancyscore',
+            name='has_overlap',
+        ),
+    ]
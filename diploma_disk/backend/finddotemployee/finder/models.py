@@ -1,8 +1,17 @@
+from contextvars import ContextVar
+
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
-from django.core.exceptions import ObjectDoesNotExist
+
+from .profile_cache import bump_profile_version
+from .utils import MATURITY_LEVEL_BOUNDS, context_maturity_level, maturity_level
 
 
 class Company(models.Model):
@@ -25,26 +34,70 @@ class Candidate(models.Model):
     age = models.PositiveIntegerField(verbose_name=_("Возраст"))
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, verbose_name=_("Аватар"))
     about = models.TextField(verbose_name=_("О себе"))
+    digital_maturity = models.PositiveSmallIntegerField(
+        default=1,
+        db_index=True,
+        editable=False,
+        verbose_name=_("Цифровая зрелость")
+    )
+    # Агрегаты навыков: зрелость с учетом любой вакансии считается без перечитывания навыков
+    skill_weight_sum = models.FloatField(default=0.0, editable=False, verbose_name=_("Сумма вес × уровень / 5"))
+    skill_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Число навыков"))
+    has_active_resume = models.BooleanField(default=False, editable=False, verbose_name=_("Есть активное резюме"))
+    unmatched_maturity = models.PositiveSmallIntegerField(
+        default=1,
+        editable=False,
+        verbose_name=_("Цифровая зрелость для вакансии без общих навыков")
+    )
+    # Имя, «о себе» и описания опыта работы для полнотекстового поиска (заполняется только в PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name=_("Поисковый вектор"))
+    # Растет при каждом сбросе сохраненной релевантности кандидата (см. invalidate_match_scores)
+    score_version = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Версия релевантности"))
 
     class Meta:
         verbose_name = _("Кандидат")
         verbose_name_plural = _("Кандидаты")
+        indexes = [
+            models.Index(fields=['unmatched_maturity', 'id'], name='finder_candidate_unmatched_idx'),
+            GinIndex(fields=['search_vector'], name='finder_candidate_search_idx'),
+        ]
 
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, update_fields=None, **kwargs):
+        super().save(*args, update_fields=editable_fields(self, update_fields), **kwargs)
+
+    def skills_maturity(self, vacancy=None):
+        """
+        Уровень зрелости (1–4) по сохраненным агрегатам навыков.
+
+        С вакансией бонус за дополнительные навыки считается как все навыки минус
+        общие с вакансией — одним агрегирующим запросом.
+        """
+        if vacancy is None or not self.skill_count:
+            return context_maturity_level(self.skill_weight_sum, self.skill_count)
+
+        overlap = vacancy_overlap(CandidateSkill.objects.filter(candidate=self), vacancy).aggregate(
+            overlap_sum=Sum(skill_value()), overlap_count=Count('id'),
+        )
+        return context_maturity_level(
+            self.skill_weight_sum, self.skill_count, overlap['overlap_sum'] or 0.0, overlap['overlap_count'],
+        )
+
     @property
     def digital_maturity_score(self):
         """
         Возвращает цифровую зрелость кандидата (1–4) на основе активного резюме.
         Учитывает контекст вакансии (_vacancy_context) для дополнительных навыков.
+        Без контекста возвращает сохраненное значение без запросов к БД.
         """
-        try:
-            resume = self.resumes.get(is_active=True)
-            resume._vacancy_context = getattr(self, '_vacancy_context', None)
-            return resume.digital_maturity_score
-        except ObjectDoesNotExist:
+        vacancy = getattr(self, '_vacancy_context', None)
+        if vacancy is None:
+            return self.digital_maturity
+        if not self.has_active_resume:
             return 1  # Минимальный уровень при отсутствии резюме
+        return self.skills_maturity(vacancy)
 
 
 class Education(models.Model):
@@ -75,6 +128,11 @@ class Resume(models.Model):
     name = models.CharField(max_length=100, default='Какое-то резюме без названия')
     candidate = models.ForeignKey('Candidate', on_delete=models.CASCADE, related_name='resumes', verbose_name=_("Кандидат"))
     is_active = models.BooleanField(default=True, verbose_name=_("Активно"))
+    digital_maturity = models.PositiveSmallIntegerField(
+        default=1,
+        editable=False,
+        verbose_name=_("Цифровая зрелость")
+    )
 
     class Meta:
         verbose_name = _("Резюме")
@@ -83,48 +141,27 @@ class Resume(models.Model):
     def __str__(self):
         return f"Резюме: {self.candidate.full_name}"
 
+    def save(self, *args, update_fields=None, **kwargs):
+        super().save(*args, update_fields=editable_fields(self, update_fields), **kwargs)
+
     @property
     def digital_maturity_score(self):
         """
         Рассчитывает цифровую зрелость кандидата (1–4) на основе весов и уровня навыков.
         Учитывает бонус за дополнительные навыки, если передан контекст вакансии.
+        Без контекста возвращает сохраненное значение без запросов к БД.
         """
-        skills = self.candidate.skills.select_related('skill').all()
-        if not skills.exists():
-            return 1  # Минимальный уровень при отсутствии навыков
-
-        # Базовый расчет: среднее взвешенное значение (вес навыка * уровень владения)
-        weighted_sum = sum(s.skill.weight * (s.rank / 5.0) for s in skills)
-        skill_count = len(skills)
-        base_score = weighted_sum / skill_count if skill_count > 0 else 0
-
-        # Учет дополнительных навыков, если есть контекст вакансии
         vacancy = getattr(self, '_vacancy_context', None)
-        if vacancy:
-            vacancy_skill_ids = {vs.skill.id for vs in vacancy.skills.select_related('skill')}
-            extra_skills = [s for s in skills if s.skill.id not in vacancy_skill_ids]
-            if extra_skills:
-                extra_bonus = sum(s.skill.weight * (s.rank / 5.0) for s in extra_skills)
-                extra_bonus = min(extra_bonus / max(len(extra_skills), 1), 0.2)  # Ограничение бонуса
-                base_score = min(base_score + extra_bonus, 1.0)  # Не выше 1.0
-
-        # Преобразование в уровень 1–4
-        if base_score <= 0.25:
-            level = 1
-        elif base_score <= 0.5:
-            level = 2
-        elif base_score <= 0.75:
-            level = 3
-        else:
-            level = 4
-
-        return level
+        if vacancy is None:
+            return self.digital_maturity
+        return self.candidate.skills_maturity(vacancy)
 
 
 class Vacancy(models.Model):
     title = models.CharField(max_length=64, verbose_name=_("Название вакансии"))
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='vacancies', verbose_name=_("Компания"))
     description = models.TextField(verbose_name=_("Описание"))
+    score_version = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Версия релевантности"))
 
     class Meta:
         verbose_name = _("Вакансия")
@@ -133,6 +170,9 @@ class Vacancy(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, update_fields=None, **kwargs):
+        super().save(*args, update_fields=editable_fields(self, update_fields), **kwargs)
+
 
 class Skill(models.Model):
     title = models.CharField(max_length=32, verbose_name=_("Название навыка"))
@@ -159,6 +199,20 @@ class CandidateSkill(models.Model):
     class Meta:
         verbose_name = _("Навык кандидата")
         verbose_name_plural = _("Навыки кандидатов")
+        indexes = [
+            # Инвертированный индекс «навык → кандидаты» для ранжирования
+            models.Index(fields=['skill', 'candidate', 'rank'], name='finder_candskill_posting_idx'),
+        ]
+
+
+def skill_value(prefix=''):
+    """SQL-выражение вес навыка * уровень / 5 для строк CandidateSkill."""
+    return F(f'{prefix}skill__weight') * (Cast(f'{prefix}rank', models.FloatField()) / Value(5.0))
+
+
+def vacancy_overlap(candidate_skills, vacancy):
+    """Строки CandidateSkill по навыкам, которые требует вакансия."""
+    return candidate_skills.filter(skill_id__in=VacancySkill.objects.filter(vacancy=vacancy).values('skill_id'))
 
 
 class VacancySkill(models.Model):
@@ -170,6 +224,176 @@ class VacancySkill(models.Model):
         verbose_name_plural = _("Навыки для вакансий")
 
 
+class CandidateVacancyScore(models.Model):
+    """
+    Сохраненные компоненты релевантности кандидата для вакансии.
+
+    Итоговый балл смешивается из компонентов с maturity_weight запроса, поэтому
+    одна строка подходит для любого веса. Строка хранит версии кандидата и вакансии,
+    по данным которых посчитана, и действует, только пока они совпадают с текущими
+    (см. current_match_scores). Версии растут в invalidate_match_scores при изменении
+    навыков кандидата, требований вакансии, весов навыков и активности резюме, поэтому
+    строка, записанная запросом со старыми навыками уже после сброса, не читается.
+    Сброс вызывают сигналы; после записи без сигналов (update(), bulk_create,
+    bulk_update) нужно самому вызвать recalculate_candidate_maturity и
+    invalidate_match_scores, как это делает save_candidate_skills.
+    """
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='vacancy_scores', verbose_name=_("Кандидат"))
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE, related_name='candidate_scores', verbose_name=_("Вакансия"))
+    skill_match_score = models.FloatField(verbose_name=_("Соответствие навыкам (0–1)"))
+    maturity_score = models.FloatField(verbose_name=_("Цифровая зрелость с учетом вакансии (0–1)"))
+    candidate_version = models.PositiveIntegerField(default=0, verbose_name=_("Версия кандидата"))
+    vacancy_version = models.PositiveIntegerField(default=0, verbose_name=_("Версия вакансии"))
+
+    class Meta:
+        verbose_name = _("Релевантность кандидата")
+        verbose_name_plural = _("Релевантность кандидатов")
+        unique_together = ('vacancy', 'candidate')
+        indexes = [
+            models.Index(fields=['candidate'], name='finder_cvscore_candidate_idx'),
+        ]
+
+    @property
+    def maturity(self):
+        """Уровень зрелости 1–4."""
+        return round(self.maturity_score * 4)
+
+
+def current_match_scores(vacancy=None):
+    """
+    Строки CandidateVacancyScore, посчитанные по текущим версиям кандидата и вакансии.
+
+    С vacancy версия вакансии берется из объекта: он загружается раньше, чем ее
+    требования, поэтому строки, записанные по этим требованиям, ей соответствуют.
+    """
+    scores = CandidateVacancyScore.objects.filter(candidate_version=F('candidate__score_version'))
+    if vacancy is not None:
+        return scores.filter(vacancy=vacancy, vacancy_version=vacancy.score_version)
+    return scores.filter(vacancy_version=F('vacancy__score_version'))
+
+
+def editable_fields(instance, update_fields):
+    """
+    Поля для save() существующей записи без полей с editable=False.
+
+    Такие поля — агрегаты зрелости, поисковый вектор и версии релевантности — пишут
+    только сигналы и массовые UPDATE. Сохранение объекта, загруженного до их
+    пересчета, иначе вернуло бы старые значения, а старая score_version снова
+    сделала бы устаревшие строки CandidateVacancyScore актуальными.
+    """
+    if update_fields is not None or instance._state.adding:
+        return update_fields
+    return [field.name for field in instance._meta.concrete_fields if field.editable and not field.primary_key]
+
+
+def invalidate_match_scores(candidate_ids=(), vacancy_ids=()):
+    """
+    Сбрасывает сохраненную релевантность затронутых кандидатов и вакансий.
+
+    Сброс — увеличение их версий: строки со старой версией больше не читаются, даже
+    если параллельный запрос допишет такую строку после сброса. Уже записанные строки
+    затем удаляются, чтобы не занимать место.
+    """
+    condition = models.Q(pk__in=[])
+    if candidate_ids:
+        Candidate.objects.filter(pk__in=candidate_ids).update(score_version=F('score_version') + 1)
+        condition |= models.Q(candidate_id__in=candidate_ids)
+    if vacancy_ids:
+        Vacancy.objects.filter(pk__in=vacancy_ids).update(score_version=F('score_version') + 1)
+        condition |= models.Q(vacancy_id__in=vacancy_ids)
+    CandidateVacancyScore.objects.filter(condition).delete()
+
+
+# Установлен, пока save_candidate_skills пишет навыки: обработчики сигналов CandidateSkill
+# пропускают пересчеты, которые функция делает сама один раз в конце
+candidate_skill_signals_muted = ContextVar('candidate_skill_signals_muted', default=False)
+
+
+def save_candidate_skills(candidate, ranks):
+    """
+    Записывает уровни навыков кандидата разницей с уже сохраненными строками.
+
+    Работает как update_or_create по каждому навыку: новые навыки добавляются,
+    уровни существующих обновляются, остальные навыки кандидата не меняются,
+    а лишние дубли переданных навыков удаляются. Добавление и обновление идут
+    массовыми запросами в одной транзакции. Удаление дублей отправляет post_delete,
+    но обработчики CandidateSkill на это время отключены (candidate_skill_signals_muted),
+    поэтому зрелость, сохраненная релевантность и кэш профиля обновляются один раз в конце.
+
+    Args:
+        candidate: Объект Candidate.
+        ranks: Словарь {id навыка: уровень владения}.
+    """
+    if not ranks:
+        return
+
+    existing = {}
+    duplicates = []
+    for row in CandidateSkill.objects.filter(candidate=candidate, skill_id__in=ranks).order_by('id'):
+        if row.skill_id in existing:
+            duplicates.append(row.pk)
+        else:
+            existing[row.skill_id] = row
+
+    changed = []
+    for skill_id, row in existing.items():
+        if row.rank != ranks[skill_id]:
+            row.rank = ranks[skill_id]
+            changed.append(row)
+    added = [
+        CandidateSkill(candidate=candidate, skill_id=skill_id, rank=rank)
+        for skill_id, rank in ranks.items() if skill_id not in existing
+    ]
+    if not (duplicates or changed or added):
+        return
+
+    with transaction.atomic():
+        if duplicates:
+            token = candidate_skill_signals_muted.set(True)
+            try:
+                CandidateSkill.objects.filter(pk__in=duplicates).delete()
+            finally:
+                candidate_skill_signals_muted.reset(token)
+        if changed:
+            CandidateSkill.objects.bulk_update(changed, ['rank'])
+        if added:
+            CandidateSkill.objects.bulk_create(added)
+        recalculate_candidate_maturity([candidate.pk])
+        invalidate_match_scores(candidate_ids=[candidate.pk])
+        bump_profile_version([candidate.user_id])
+
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = 'russian'
+
+
+def candidate_search_vector():
+    """
+    SQL-выражение поискового вектора кандидата.
+
+    Вес A — имя, B — «о себе», C — описания опыта работы одной строкой.
+    """
+    experience = (
+        Experience.objects.filter(candidate=OuterRef('pk'))
+        .order_by()
+        .values('candidate')
+        .annotate(text=StringAgg('about', ' ', output_field=models.TextField()))
+        .values('text')
+    )
+    return (
+        SearchVector('full_name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('about', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(experience), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(candidate_ids):
+    """Пересчитывает поисковый вектор кандидатов одним запросом UPDATE (только PostgreSQL)."""
+    if connection.vendor != 'postgresql' or not candidate_ids:
+        return
+    Candidate.objects.filter(pk__in=candidate_ids).update(search_vector=candidate_search_vector())
+
+
 class HR(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Пользователь")
     company = models.ForeignKey(Company, on_delete=models.CASCADE, verbose_name="Компания")
@@ -227,34 +451,121 @@ class CompanyMaturityAnswer(models.Model):
         unique_together = ('company', 'question')
 
 
+def company_maturity_aggregates():
+    """Агрегаты ответов анкеты: сумма весов вопросов и сумма ответ * вес вопроса."""
+    return {
+        'total_weight': Sum('question__weight'),
+        'weighted_sum': Sum(F('answer_value') * F('question__weight'), output_field=models.FloatField()),
+    }
+
+
 def recalculate_company_maturity(company: 'Company'):
     """Пересчитывает индекс цифровой зрелости и сохраняет его в поле `maturity_level`."""
-    answers = company.maturity_answers.select_related('question')
-    if not answers.exists():
-        company.maturity_level = 0
-        company.save(update_fields=['maturity_level'])
-        return
+    totals = company.maturity_answers.aggregate(**company_maturity_aggregates())
+    total_weight = totals['total_weight']
 
-    total_weight = sum(a.question.weight for a in answers)
-    if total_weight == 0:
+    # Без ответов или при нулевом весе вопросов индекс не определен
+    if not total_weight:
         company.maturity_level = 0
-        company.save(update_fields=['maturity_level'])
-        return
+    else:
+        # Переводим в уровень 1‑4 согласно границам.
+        company.maturity_level = maturity_level(totals['weighted_sum'] / total_weight)
+    company.save(update_fields=['maturity_level'])
 
-    weighted_score = sum(a.answer_value * a.question.weight for a in answers) / total_weight
 
-    # Переводим в уровень 1‑4 согласно границам.
-    if weighted_score <= 0.25:
-        level = 1
-    elif weighted_score <= 0.5:
-        level = 2
-    elif weighted_score <= 0.75:
-        level = 3
-    else:
-        level = 4
+def recalculate_companies_maturity(company_ids=None):
+    """
+    Пересчитывает индекс цифровой зрелости компаний одним запросом UPDATE.
+
+    Индекс считается в БД коррелированным подзапросом с теми же агрегатами
+    и границами уровней, что и в recalculate_company_maturity. Сигналы
+    post_save не отправляются, поэтому кэш профилей HR этих компаний
+    сбрасывается здесь же.
+
+    Args:
+        company_ids: id компаний (список или values_list-запрос); None — все компании.
+
+    Returns:
+        int: Число обновленных компаний.
+    """
+    levels = (
+        CompanyMaturityAnswer.objects.filter(company=OuterRef('pk'))
+        .order_by()
+        .values('company')
+        .annotate(**company_maturity_aggregates())
+        .annotate(score=F('weighted_sum') / NullIf(F('total_weight'), 0.0))
+        .annotate(level=Case(
+            When(score__isnull=True, then=Value(0)),  # Нулевой вес вопросов
+            *[When(score__lte=bound, then=Value(level)) for level, bound in MATURITY_LEVEL_BOUNDS],
+            default=Value(4),
+            output_field=models.IntegerField(),
+        ))
+        .values('level')
+    )
+    companies = Company.objects.all()
+    hrs = HR.objects.all()
+    if company_ids is not None:
+        companies = companies.filter(pk__in=company_ids)
+        hrs = hrs.filter(company_id__in=company_ids)
+    updated = companies.update(maturity_level=Coalesce(Subquery(levels), Value(0)))
+    bump_profile_version(hrs.values_list('user_id', flat=True))
+    return updated
+
+
+def candidate_maturity_fields(weighted_sum, skill_count, active):
+    """Сохраняемые агрегаты и уровни зрелости кандидата по сумме и числу его навыков."""
+    return {
+        'skill_weight_sum': weighted_sum,
+        'skill_count': skill_count,
+        'has_active_resume': active,
+        # Кандидат отражает зрелость только при наличии активного резюме
+        'digital_maturity': context_maturity_level(weighted_sum, skill_count) if active else 1,
+        'unmatched_maturity': context_maturity_level(weighted_sum, skill_count, 0.0, 0) if active else 1,
+    }
+
+
+def recalculate_candidate_maturity(candidate_ids):
+    """
+    Пересчитывает сохраненные агрегаты навыков и цифровую зрелость кандидатов и их резюме.
+
+    Вызывается при изменении навыков кандидата, весов навыков и активности резюме.
+    Возвращает id кандидатов, у которых агрегаты изменились.
+    """
+    candidate_ids = set(candidate_ids)
+    if not candidate_ids:
+        return []
+
+    totals = {candidate_id: [0, 0] for candidate_id in candidate_ids}
+    rows = (
+        CandidateSkill.objects.filter(candidate_id__in=candidate_ids)
+        .order_by('id')
+        .values_list('candidate_id', 'rank', 'skill__weight')
+    )
+    for candidate_id, rank, weight in rows:
+        totals[candidate_id][0] += weight * (rank / 5.0)
+        totals[candidate_id][1] += 1
+    with_active_resume = set(
+        Resume.objects.filter(candidate_id__in=candidate_ids, is_active=True).values_list('candidate_id', flat=True)
+    )
 
-    company.maturity_level = level
-    company.save(update_fields=['maturity_level'])
+    # Резюме отражает навыки кандидата, сам кандидат — только при наличии активного резюме
+    fields = ['skill_weight_sum', 'skill_count', 'has_active_resume', 'digital_maturity', 'unmatched_maturity']
+    changed = []
+    resume_levels = {}
+    for candidate in Candidate.objects.filter(id__in=candidate_ids).only('id', *fields):
+        weighted_sum, skill_count = totals[candidate.id]
+        level = context_maturity_level(weighted_sum, skill_count)
+        values = candidate_maturity_fields(weighted_sum, skill_count, candidate.id in with_active_resume)
+        if any(getattr(candidate, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(candidate, field, value)
+            changed.append(candidate)
+        resume_levels.setdefault(level, []).append(candidate.id)
+
+    Candidate.objects.bulk_update(changed, fields, batch_size=500)
+    for level, ids in resume_levels.items():
+        Resume.objects.filter(candidate_id__in=ids).exclude(digital_maturity=level).update(digital_maturity=level)
+    return [candidate.id for candidate in changed]
 
 
 class DisciplineFeedback(models.Model):
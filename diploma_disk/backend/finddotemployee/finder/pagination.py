@@ -0,0 +1,60 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class RankingCursorPagination(BasePagination):
+    """
+    Курсорная пагинация рейтинга по ключу (балл, группа, id) без OFFSET и COUNT.
+
+    Работает с RankedCandidates: курсор хранит ranking_key последнего кандидата
+    страницы, следующая страница читается через RankedCandidates.after. Пересчет
+    баллов между запросами не сдвигает позиции, поэтому кандидаты не повторяются
+    из-за смещения. Ссылка назад не поддерживается.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page = queryset.after(self.decode_cursor(request), self.page_size + 1)
+        self.next_key = page[self.page_size - 1].ranking_key if len(page) > self.page_size else None
+        return page[:self.page_size]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            score, tier, pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return float(score), int(tier), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key):
+        score, tier, pk = key
+        # repr сохраняет балл без потерь, курсор сравнивается с баллом из БД на точное равенство
+        token = urlsafe_b64encode(f'{score!r}|{tier}|{pk}'.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return self.encode_cursor(self.next_key)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,43 @@
+"""
+Кэш ответа ProfileView по версии профиля пользователя.
+
+Версия хранится в CustomUser.profile_version и увеличивается сигналами при
+изменении данных профиля, поэтому сброс виден всем воркерам и management-командам.
+Ответ кэшируется в кэше процесса под ключом с версией, а ETag строится из нее же:
+проверка If-None-Match стоит одного запроса версии, а ответ под устаревшей
+версией больше не читается.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from authorization.models import CustomUser
+
+
+def profile_version(user_id):
+    """Текущая версия профиля пользователя."""
+    return CustomUser.objects.filter(pk=user_id).values_list('profile_version', flat=True).first() or 0
+
+
+def profile_etag(user_id, version):
+    return f'"profile-{user_id}-{version}"'
+
+
+def get_cached_profile(user_id, version):
+    return cache.get(f'profile:{user_id}:{version}')
+
+
+def set_cached_profile(user_id, version, payload):
+    cache.set(f'profile:{user_id}:{version}', payload, getattr(settings, 'PROFILE_CACHE_TIMEOUT', 60 * 60))
+
+
+def bump_profile_version(user_ids):
+    """
+    Увеличивает версии профилей в текущей транзакции.
+
+    Версия читается до данных профиля, поэтому запрос, увидевший новую версию,
+    видит и зафиксированные вместе с ней данные.
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        CustomUser.objects.filter(pk__in=user_ids).update(profile_version=F('profile_version') + 1)
@@ -1,7 +1,17 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import (Company, Candidate, Education, Experience, Resume,
-    Vacancy, Skill, CandidateSkill, VacancySkill, HR, MaturityQuestion, DisciplineFeedback)
-from .utils import calculate_match_score
+    Vacancy, Skill, CandidateSkill, VacancySkill, HR, MaturityQuestion, DisciplineFeedback,
+    save_candidate_skills)
+from .fields import BulkPrimaryKeyRelatedField, BulkRelatedListSerializer
+from .utils import calculate_match_score, parse_maturity_weight
+
+
+def request_maturity_weight(context):
+    """Вес цифровой зрелости из query string запроса в контексте сериализатора."""
+    request = context.get('request')
+    return parse_maturity_weight(request.query_params.get('maturity_weight') if request else None)
 
 
 class CompanySerializer(serializers.ModelSerializer):
@@ -16,9 +26,12 @@ class SkillSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'weight']
 
 class CandidateSkillNestedSerializer(serializers.Serializer):
-    skill = serializers.PrimaryKeyRelatedField(queryset=Skill.objects.all())
+    skill = BulkPrimaryKeyRelatedField(queryset=Skill.objects.all())
     rank = serializers.IntegerField(min_value=1, max_value=5)
 
+    class Meta:
+        list_serializer_class = BulkRelatedListSerializer
+
 
 
 
@@ -54,12 +67,11 @@ class CandidateBaseSerializer(serializers.ModelSerializer):
         if not vacancy:
             return None
 
-        try:
-            maturity_weight = float(self.context['request'].query_params.get('maturity_weight', 0.3))
-        except (TypeError, ValueError):
-            maturity_weight = 0.3
+        # Балл уже посчитан при ранжировании
+        if hasattr(candidate, 'match_score'):
+            return candidate.match_score
 
-        return calculate_match_score(candidate, vacancy, maturity_weight)
+        return calculate_match_score(candidate, vacancy, request_maturity_weight(self.context))
 
 
     skills = CandidateSkillSerializer(source='skills', many=True, read_only=True)
@@ -72,8 +84,15 @@ class ResumeSerializer(serializers.ModelSerializer):
         model = Resume
         fields = ['id', 'name', 'candidate', 'is_active', 'digital_maturity_score', 'skills']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Навыки кандидата резюме вместе с самими навыками — фиксированным числом запросов."""
+        return queryset.select_related('candidate').prefetch_related(
+            Prefetch('candidate__skills', queryset=CandidateSkill.objects.select_related('skill')),
+        )
+
     def get_digital_maturity_score(self, obj):
-        return obj.digital_maturity_score
+        return obj.digital_maturity
 
 
 class ResumeWriteSerializer(serializers.ModelSerializer):
@@ -89,33 +108,28 @@ class ResumeWriteSerializer(serializers.ModelSerializer):
         if not hasattr(request.user, 'candidate'):
             raise serializers.ValidationError('Current user is not a candidate.')
         candidate = request.user.candidate
-        resume = Resume.objects.create(candidate=candidate, **validated_data)
-
-        for skill_entry in skills_data:
-            CandidateSkill.objects.update_or_create(
-                candidate=candidate,
-                skill=skill_entry['skill'],
-                defaults={'rank': skill_entry['rank']}
-            )
+        with transaction.atomic():
+            resume = Resume.objects.create(candidate=candidate, **validated_data)
+            save_candidate_skills(candidate, self.skill_ranks(skills_data))
         return resume
 
     def update(self, instance, validated_data):
         skills_data = validated_data.pop('skills', None)
-        # Update is_active if present
-        if 'is_active' in validated_data:
-            instance.is_active = validated_data['is_active']
-            instance.save()
-
-        if skills_data is not None:
-            candidate = instance.candidate
-            for skill_entry in skills_data:
-                CandidateSkill.objects.update_or_create(
-                    candidate=candidate,
-                    skill=skill_entry['skill'],
-                    defaults={'rank': skill_entry['rank']}
-                )
+        with transaction.atomic():
+            # Update is_active if present
+            if 'is_active' in validated_data:
+                instance.is_active = validated_data['is_active']
+                instance.save()
+
+            if skills_data is not None:
+                save_candidate_skills(instance.candidate, self.skill_ranks(skills_data))
         return instance
 
+    @staticmethod
+    def skill_ranks(skills_data):
+        """Уровни по id навыка; при повторе навыка действует последний."""
+        return {entry['skill'].pk: entry['rank'] for entry in skills_data}
+
 
 class VacancySkillSerializer(serializers.ModelSerializer):
     skill = SkillSerializer()
@@ -128,7 +142,7 @@ class VacancySkillSerializer(serializers.ModelSerializer):
 class VacancySerializer(serializers.ModelSerializer):
     company = serializers.HiddenField(default=1)
     match_score = serializers.SerializerMethodField()
-    skills = serializers.PrimaryKeyRelatedField(
+    skills = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Skill.objects.all(),  # queryset обязателен для записи
     )
@@ -151,19 +165,17 @@ class VacancySerializer(serializers.ModelSerializer):
         return vacancy
 
     def get_match_score(self, vacancy):
-        request = self.context.get('request')
         candidate = self.context.get('candidate')
 
         # если нет кандидата — не считаем
         if not candidate:
             return None
 
-        try:
-            maturity_weight = float(request.query_params.get('maturity_weight', 0.3))
-        except (TypeError, ValueError):
-            maturity_weight = 0.3
+        # Балл уже посчитан в recommend_vacancies
+        if hasattr(vacancy, 'match_score'):
+            return vacancy.match_score
 
-        return calculate_match_score(candidate, vacancy, maturity_weight)
+        return calculate_match_score(candidate, vacancy, request_maturity_weight(self.context))
 
 
 
@@ -192,15 +204,24 @@ class MaturityQuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'text', 'weight']
 
 
+class CompanyMaturityAnswerListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # Все вопросы анкеты проверяются одним запросом
+        question_ids = {item['question_id'] for item in attrs}
+        found = set(MaturityQuestion.objects.filter(id__in=question_ids).values_list('id', flat=True))
+        missing = sorted(question_ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Вопрос не найден: {', '.join(map(str, missing))}")
+        return attrs
+
+
 class CompanyMaturityAnswerSerializer(serializers.Serializer):
     """Используется только для записи списка ответов."""
     question_id = serializers.IntegerField()
     answer_value = serializers.FloatField(min_value=0.0, max_value=1.0)
 
-    def validate_question_id(self, value):
-        if not MaturityQuestion.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Вопрос не найден")
-        return value
+    class Meta:
+        list_serializer_class = CompanyMaturityAnswerListSerializer
 
 class EducationNestedSerializer(serializers.ModelSerializer):
     class Meta:
@@ -217,7 +238,7 @@ class ExperienceNestedSerializer(serializers.ModelSerializer):
 class CandidateSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True)
     match_score = serializers.SerializerMethodField(read_only=True)
-    digital_maturity_score = serializers.FloatField(read_only=True)
+    digital_maturity_score = serializers.SerializerMethodField(read_only=True)
     skills = serializers.SerializerMethodField(read_only=True)
     resumes = serializers.SerializerMethodField(read_only=True)
     education = EducationNestedSerializer(source='education_set', many=True, read_only=True)
@@ -227,18 +248,31 @@ class CandidateSerializer(serializers.ModelSerializer):
         model = Candidate
         fields = ['id', 'full_name', 'age', 'avatar', 'about', 'match_score', 'digital_maturity_score', 'skills', 'education', 'experience', 'resumes']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Подгружает все связи, которые читает сериализатор, фиксированным числом запросов."""
+        return queryset.prefetch_related(
+            Prefetch('skills', queryset=CandidateSkill.objects.select_related('skill')),
+            'resumes',
+            'education_set',
+            Prefetch('experience_set', queryset=Experience.objects.select_related('company')),
+        )
+
     def get_match_score(self, candidate):
         vacancy = self.context.get('vacancy')
         if not vacancy:
             return None
 
-        from .utils import calculate_match_score
-        try:
-            maturity_weight = float(self.context['request'].query_params.get('maturity_weight', 0.3))
-        except (TypeError, ValueError):
-            maturity_weight = 0.3
+        # Балл уже посчитан для всего пула в rank_candidates
+        if hasattr(candidate, 'match_score'):
+            return candidate.match_score
+
+        return calculate_match_score(candidate, vacancy, request_maturity_weight(self.context))
 
-        return calculate_match_score(candidate, vacancy, maturity_weight)
+    def get_digital_maturity_score(self, candidate):
+        if hasattr(candidate, 'vacancy_maturity_score'):
+            return float(candidate.vacancy_maturity_score)
+        return float(candidate.digital_maturity_score)  # сохраненное значение, если нет контекста вакансии
 
 
 
@@ -253,7 +287,7 @@ class CandidateSerializer(serializers.ModelSerializer):
                 'title': cs.skill.title,
                 'rank': cs.rank
             }
-            for cs in candidate.skills.select_related('skill').all()
+            for cs in candidate.skills.all()
         ]
 
 # api/serializers.py
@@ -1,12 +1,468 @@
 # vacancies/services.py
+import heapq
+from collections import Counter, defaultdict
 from typing import List
-from .utils import calculate_match_score   # ← твоя функция
 
-def add_match_and_sort(vacancies: List["Vacancy"], candidate: "Candidate"):
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Count, F, FilteredRelation, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from finddotemployee.timing import timed
+
+from .models import (
+    SEARCH_CONFIG, Candidate, CandidateSkill, CandidateVacancyScore, Experience, Vacancy, VacancySkill,
+    current_match_scores, skill_value,
+)
+from .utils import (
+    DEFAULT_MATURITY_WEIGHT, blend_components, blend_match_score, context_maturity_level, skill_match_score,
+    skills_maturity_level,
+)
+
+
+def add_match_and_sort(vacancies: List["Vacancy"], candidate: "Candidate",
+                       maturity_weight=DEFAULT_MATURITY_WEIGHT):
     """
     Проставляет каждому объекту .match_score и возвращает
     отсортированный список (по убыванию).
+
+    Баллы считаются пакетно через iter_vacancy_scores.
     """
+    vacancies = list(vacancies)
+    scores = dict(iter_vacancy_scores(candidate, Vacancy.objects.filter(pk__in=[v.pk for v in vacancies]),
+                                      maturity_weight))
     for v in vacancies:
-        v.match_score = calculate_match_score(candidate, v)  # ← уже существующая логика
+        v.match_score = scores.get(v.pk, 0.0)
     return sorted(vacancies, key=lambda v: v.match_score, reverse=True)
+
+
+def iter_vacancy_scores(candidate, vacancies=None, maturity_weight=DEFAULT_MATURITY_WEIGHT):
+    """
+    Релевантность кандидата для каждой вакансии пула за фиксированное число запросов.
+
+    Навыки кандидата загружаются один раз, требования вакансий — одним проходом
+    по VacancySkill. Значения совпадают с calculate_match_score для каждой пары.
+
+    Yields:
+        tuple: (id вакансии, итоговый балл).
+    """
+    if vacancies is None:
+        vacancies = Vacancy.objects.all()
+
+    ranks, values = {}, []
+    skill_rows = (
+        CandidateSkill.objects.filter(candidate=candidate).order_by('id')
+        .values_list('skill_id', 'rank', 'skill__weight')
+    )
+    for skill_id, rank, weight in skill_rows:
+        ranks[skill_id] = rank / 5.0
+        values.append((skill_id, weight * (rank / 5.0)))
+
+    requirements = defaultdict(list)
+    requirement_rows = (
+        VacancySkill.objects.filter(vacancy__in=vacancies).order_by('id')
+        .values_list('vacancy_id', 'skill_id', 'skill__weight')
+    )
+    for vacancy_id, skill_id, weight in requirement_rows.iterator(chunk_size=2000):
+        requirements[vacancy_id].append((skill_id, weight))
+
+    for vacancy_id in vacancies.order_by().values_list('id', flat=True).iterator(chunk_size=2000):
+        vacancy_skills = requirements.get(vacancy_id, ())
+        skill_score = skill_match_score(ranks, vacancy_skills)
+        if skill_score is None:
+            yield vacancy_id, 0.0
+            continue
+        if candidate.has_active_resume:
+            maturity = skills_maturity_level(values, {skill_id for skill_id, _ in vacancy_skills})
+        else:
+            maturity = 1  # Минимальный уровень при отсутствии активного резюме
+        yield vacancy_id, blend_match_score(skill_score, maturity, maturity_weight)
+
+
+def recommend_vacancies(candidate, vacancies=None, maturity_weight=DEFAULT_MATURITY_WEIGHT, limit=20):
+    """
+    Лучшие limit вакансий для кандидата по убыванию релевантности (при равном балле — по id).
+
+    Баллы не накапливаются: лучшие вакансии отбираются ограниченной кучей
+    прямо из потока iter_vacancy_scores.
+    """
+    if vacancies is None:
+        vacancies = Vacancy.objects.all()
+    top = heapq.nsmallest(
+        limit,
+        iter_vacancy_scores(candidate, vacancies, maturity_weight),
+        key=lambda row: (-row[1], row[0]),
+    )
+    objects = vacancies.prefetch_related('skills').in_bulk([pk for pk, _ in top])
+    result = []
+    for pk, score in top:
+        vacancy = objects.get(pk)
+        if vacancy is None:
+            continue  # Вакансия удалена после расчета
+        vacancy.match_score = score
+        result.append(vacancy)
+    return result
+
+
+def get_vacancy_skills(vacancy):
+    """Пары (id навыка, вес навыка) требований вакансии."""
+    return list(VacancySkill.objects.filter(vacancy=vacancy).values_list('skill_id', 'skill__weight'))
+
+
+def matching_candidates(candidates, skill_ids):
+    """
+    Кандидаты, у которых есть хотя бы один из навыков.
+
+    Проходит только по спискам CandidateSkill нужных навыков (индекс skill, candidate),
+    а не по всей таблице кандидатов.
+    """
+    return candidates.filter(id__in=skill_postings(skill_ids))
+
+
+def skill_postings(skill_ids):
+    """Подзапрос id кандидатов из списков CandidateSkill заданных навыков."""
+    return CandidateSkill.objects.filter(skill_id__in=skill_ids).values('candidate_id')
+
+
+def overlap_aggregates(candidates, vacancy_skills):
+    """
+    Агрегаты пересечения навыков кандидатов с вакансией одним запросом.
+
+    Для каждого кандидата с общими навыками возвращает строку
+    (id, сумма соответствия, сумма и число общих навыков, сумма и число всех навыков,
+    есть ли активное резюме, версия релевантности кандидата). Версия читается тем же
+    запросом, что и агрегаты. Предполагается, что навык у кандидата не повторяется.
+    """
+    value = skill_value()
+    match_value = value
+    repeated = {skill_id: n for skill_id, n in Counter(s for s, _ in vacancy_skills).items() if n > 1}
+    if repeated:
+        # Навык, указанный в вакансии несколько раз, учитывается в соответствии столько же раз
+        match_value = value * Case(
+            *[When(skill_id=skill_id, then=Value(float(n))) for skill_id, n in repeated.items()],
+            default=Value(1.0),
+        )
+    return (
+        CandidateSkill.objects.filter(skill_id__in={s for s, _ in vacancy_skills}, candidate__in=candidates)
+        .values(
+            'candidate_id', 'candidate__skill_weight_sum', 'candidate__skill_count', 'candidate__has_active_resume',
+            'candidate__score_version',
+        )
+        .annotate(match_sum=Sum(match_value), overlap_sum=Sum(value), overlap_count=Count('id'))
+        .values_list(
+            'candidate_id', 'match_sum', 'overlap_sum', 'overlap_count',
+            'candidate__skill_weight_sum', 'candidate__skill_count', 'candidate__has_active_resume',
+            'candidate__score_version',
+        )
+        .order_by()
+    )
+
+
+def match_components(row, total_weight):
+    """Соответствие навыкам (0–1) и уровень зрелости (1–4) по строке overlap_aggregates."""
+    _, match_sum, overlap_sum, overlap_count, weighted_sum, skill_count, active, _ = row
+    if active:
+        maturity = context_maturity_level(weighted_sum, skill_count, overlap_sum, overlap_count)
+    else:
+        maturity = 1  # Минимальный уровень при отсутствии активного резюме
+    return round(match_sum / total_weight, 9), maturity
+
+
+@timed('match')
+def fill_match_scores(vacancy, candidates=None, vacancy_skills=None):
+    """
+    Досчитывает CandidateVacancyScore кандидатов с общими навыками, у которых нет актуальной строки.
+
+    Кандидаты без общих навыков не сохраняются: их балл — только зрелость unmatched_maturity,
+    которая уже хранится у кандидата (см. tail_score).
+
+    Кандидаты без актуальных строк ищутся анти-соединением по индексу (vacancy, candidate),
+    поэтому для уже посчитанной вакансии запрос возвращает пустой результат. Устаревшие
+    строки перезаписываются. Строка получает версию вакансии из объекта vacancy, загруженного
+    до чтения vacancy_skills, и версию кандидата, прочитанную вместе с его навыками.
+
+    Returns:
+        int: Число записанных строк.
+    """
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    if vacancy_skills is None:
+        vacancy_skills = get_vacancy_skills(vacancy)
+    total_weight = sum(weight for _, weight in vacancy_skills)
+    if total_weight == 0:
+        return 0  # Балл всех кандидатов нулевой, хранить нечего
+
+    missing = candidates.exclude(id__in=current_match_scores(vacancy).values('candidate_id'))
+    scores = []
+    for row in overlap_aggregates(missing, vacancy_skills):
+        skill_score, maturity = match_components(row, total_weight)
+        scores.append(CandidateVacancyScore(
+            candidate_id=row[0], vacancy=vacancy, skill_match_score=skill_score, maturity_score=maturity / 4.0,
+            candidate_version=row[-1], vacancy_version=vacancy.score_version,
+        ))
+    CandidateVacancyScore.objects.bulk_create(
+        scores, batch_size=1000, update_conflicts=True, unique_fields=['vacancy', 'candidate'],
+        update_fields=['skill_match_score', 'maturity_score', 'candidate_version', 'vacancy_version'],
+    )
+    return len(scores)
+
+
+def blended_score(maturity_weight=DEFAULT_MATURITY_WEIGHT, prefix=''):
+    """SQL-выражение неокругленного итогового балла по компонентам CandidateVacancyScore (как blend_components)."""
+    return (
+        Value(1 - maturity_weight, output_field=FloatField()) * F(f'{prefix}skill_match_score')
+        + Value(float(maturity_weight), output_field=FloatField()) * F(f'{prefix}maturity_score')
+    )
+
+
+def tail_score(maturity_weight=DEFAULT_MATURITY_WEIGHT):
+    """SQL-выражение балла кандидата без общих навыков: blend_components(0.0, unmatched_maturity / 4)."""
+    return (
+        Value(1 - maturity_weight, output_field=FloatField()) * Value(0.0)
+        + Value(float(maturity_weight), output_field=FloatField())
+        * (Cast('unmatched_maturity', FloatField()) / Value(4.0))
+    )
+
+
+class RankedCandidates:
+    """
+    Отсортированный по релевантности список кандидатов для пагинации.
+
+    Компоненты балла кандидатов с общими навыками хранятся в CandidateVacancyScore
+    (недостающие досчитываются одним агрегирующим запросом по спискам навыков вакансии).
+    Итоговый балл с весом зрелости из запроса смешивается в SQL, поэтому один набор
+    компонентов подходит для любого maturity_weight.
+
+    Страницы читаются по ключу последнего кандидата через after (для
+    RankingCursorPagination), весь рейтинг — через stream или итерацию.
+    Кандидаты без общих навыков получают только балл за сохраненную зрелость
+    unmatched_maturity, поэтому образуют не больше четырех групп с одинаковым баллом
+    и читаются по индексу лишь когда страница до них доходит. Порядок — по
+    неокругленному баллу, при равном балле кандидаты с общими навыками идут раньше,
+    дальше — по id. В match_score балл округлен до 0.001.
+
+    min_score отсекает кандидатов с неокругленным баллом ниже порога в SQL: условием
+    на балл для кандидатов с общими навыками и отбрасыванием групп хвоста.
+    """
+
+    def __init__(self, vacancy, candidates=None, maturity_weight=DEFAULT_MATURITY_WEIGHT, min_score=None):
+        if candidates is None:
+            candidates = Candidate.objects.all()
+        self.vacancy = vacancy
+        self.candidates = candidates
+        self.maturity_weight = maturity_weight
+        self.min_score = min_score
+        self.vacancy_skills = get_vacancy_skills(vacancy)
+        self.total_weight = sum(weight for _, weight in self.vacancy_skills)
+
+        if self.total_weight == 0:
+            # Без весов навыков балл у всех нулевой — рейтинг идет по id
+            self.skill_ids = set()
+            if not self._passes(0.0):
+                self.candidates = candidates.none()
+        else:
+            self.skill_ids = {skill_id for skill_id, _ in self.vacancy_skills}
+            fill_match_scores(vacancy, candidates, self.vacancy_skills)
+
+    def _passes(self, score):
+        return self.min_score is None or score >= self.min_score
+
+    def _matched_queryset(self):
+        scores = current_match_scores(self.vacancy)
+        if self.candidates.query.has_filters():
+            scores = scores.filter(candidate__in=self.candidates)
+        scores = scores.annotate(score=blended_score(self.maturity_weight))
+        if self.min_score is not None:
+            scores = scores.filter(score__gte=self.min_score)
+        return scores
+
+    def _matched(self, scores, limit):
+        """Первые limit кандидатов с общими навыками: [(id, балл, уровень зрелости, 0)]."""
+        rows = (
+            scores.order_by('-score', 'candidate_id')
+            .values_list('candidate_id', 'score', 'maturity_score')[:limit]
+        )
+        return [(pk, score, round(maturity_score * 4), 0) for pk, score, maturity_score in rows]
+
+    def _tail_rows(self, score, levels, limit, after_id=None):
+        """Первые limit кандидатов без общих навыков из группы: [(id, балл, уровень зрелости, 1)]."""
+        tail = self._tail_queryset().filter(unmatched_maturity__in=levels)
+        if after_id is not None:
+            tail = tail.filter(id__gt=after_id)
+        rows = tail.order_by('id').values_list('id', 'unmatched_maturity')[:limit]
+        return [(pk, score, level, 1) for pk, level in rows]
+
+    def _tail_queryset(self):
+        return self.candidates.exclude(id__in=skill_postings(self.skill_ids))
+
+    def __iter__(self):
+        return self.stream()
+
+    def after(self, key=None, limit=25):
+        """
+        До limit кандидатов, следующих в рейтинге за ключом.
+
+        Ключ — ranking_key последнего кандидата предыдущей страницы:
+        (неокругленный балл, 0 для кандидатов с общими навыками и 1 для остальных, id),
+        None — начало рейтинга. Не использует OFFSET и COUNT, поэтому любая
+        страница стоит столько же, сколько первая.
+        """
+        if not self.skill_ids:
+            candidates = self.candidates.order_by('id')
+            if key is not None:
+                candidates = candidates.filter(id__gt=key[2])
+            return self._load([(pk, 0.0, None, 1) for pk in candidates.values_list('id', flat=True)[:limit]])
+
+        scores = self._matched_queryset()
+        if key is not None:
+            score, tier, pk = key
+            after = Q(score__lt=score)
+            if tier == 0:
+                after |= Q(score=score, candidate_id__gt=pk)
+            scores = scores.filter(after)
+        matched = self._matched(scores, limit)
+
+        # Группы хвоста по всем уровням зрелости — без подсчета их размеров
+        groups = {}
+        for level in range(1, 5):
+            groups.setdefault(blend_components(0.0, level / 4.0, self.maturity_weight), []).append(level)
+
+        rows = []
+        position = 0
+        for score, levels in sorted(groups.items(), reverse=True):
+            if not self._passes(score):
+                break  # Дальше группы только с меньшим баллом
+            if key is not None and score > key[0]:
+                continue  # Группа целиком выше курсора
+            while position < len(matched) and matched[position][1] >= score and len(rows) < limit:
+                rows.append(matched[position])
+                position += 1
+            if len(rows) == limit:
+                break
+            after_id = key[2] if key is not None and key[:2] == (score, 1) else None
+            rows.extend(self._tail_rows(score, levels, limit - len(rows), after_id))
+            if len(rows) == limit:
+                break
+        rows.extend(matched[position:position + limit - len(rows)])
+        return self._load(rows)
+
+    def stream(self, chunk_size=2000):
+        """
+        Весь рейтинг одним запросом, кандидаты читаются порциями по chunk_size.
+
+        Строки CandidateVacancyScore присоединяются LEFT JOIN, а балл кандидатов без
+        общих навыков считается в том же выражении, поэтому пул сортируется в БД один
+        раз, а в PostgreSQL iterator() читает результат серверным курсором. Порядок
+        и атрибуты кандидатов — как у страниц after.
+        """
+        if not self.skill_ids:
+            rows = self.candidates.order_by('id').annotate(
+                rank_score=Value(0.0, output_field=FloatField()), rank_tier=Value(1),
+                matched_maturity=Value(None, output_field=FloatField()),
+            )
+        else:
+            scores = Q(
+                vacancy_scores__vacancy=self.vacancy, vacancy_scores__vacancy_version=self.vacancy.score_version,
+                vacancy_scores__candidate_version=F('score_version'),
+            )
+            rows = self.candidates.annotate(
+                matched=FilteredRelation('vacancy_scores', condition=scores),
+            ).annotate(
+                rank_score=Coalesce(blended_score(self.maturity_weight, 'matched__'), tail_score(self.maturity_weight)),
+                rank_tier=Case(When(matched__id__isnull=False, then=Value(0)), default=Value(1)),
+                matched_maturity=F('matched__maturity_score'),
+            ).order_by('-rank_score', 'rank_tier', 'id')
+            if self.min_score is not None:
+                rows = rows.filter(rank_score__gte=self.min_score)
+
+        for candidate in rows.iterator(chunk_size=chunk_size):
+            if candidate.matched_maturity is not None:
+                level = round(candidate.matched_maturity * 4)
+            elif self.skill_ids:
+                level = candidate.unmatched_maturity
+            else:
+                level = candidate.digital_maturity  # Без навыков у вакансии зрелость без ее контекста
+            candidate.match_score, candidate.vacancy_maturity_score = round(candidate.rank_score, 3), level
+            candidate.ranking_key = (candidate.rank_score, candidate.rank_tier, candidate.pk)
+            yield candidate
+
+    def _load(self, rows):
+        """Объекты кандидатов для строк (id, балл, уровень зрелости, группа) в том же порядке."""
+        objects = self.candidates.in_bulk([pk for pk, _, _, _ in rows])
+        page = []
+        for pk, score, level, tier in rows:
+            candidate = objects.get(pk)
+            if candidate is None:
+                continue  # Кандидат удален после расчета рейтинга
+            if level is None:
+                level = candidate.digital_maturity  # Без навыков у вакансии зрелость без ее контекста
+            candidate.match_score, candidate.vacancy_maturity_score = round(score, 3), level
+            candidate.ranking_key = (score, tier, pk)
+            page.append(candidate)
+        return page
+
+
+def rank_candidates(vacancy, candidates=None, maturity_weight=DEFAULT_MATURITY_WEIGHT, min_score=None):
+    """Кандидаты, отсортированные по убыванию релевантности для вакансии."""
+    return RankedCandidates(vacancy, candidates, maturity_weight, min_score)
+
+
+def filter_candidates(candidates, min_maturity=None, min_age=None, max_age=None, skill_ids=(), min_skill_rank=1,
+                      active_resume=False):
+    """
+    Фильтры пула кандидатов до ранжирования, все — условиями SQL.
+
+    Args:
+        candidates: QuerySet кандидатов.
+        min_maturity: Минимальная сохраненная цифровая зрелость (digital_maturity).
+        min_age, max_age: Границы возраста включительно.
+        skill_ids: Обязательные навыки — кандидат должен владеть каждым.
+        min_skill_rank: Минимальный уровень владения обязательными навыками.
+        active_resume: Только кандидаты с активным резюме.
+    """
+    if min_maturity is not None:
+        candidates = candidates.filter(digital_maturity__gte=min_maturity)
+    if min_age is not None:
+        candidates = candidates.filter(age__gte=min_age)
+    if max_age is not None:
+        candidates = candidates.filter(age__lte=max_age)
+    for skill_id in set(skill_ids):
+        # Подзапрос по индексу (навык, кандидат, уровень) на каждый навык
+        candidates = candidates.filter(
+            id__in=CandidateSkill.objects.filter(skill_id=skill_id, rank__gte=min_skill_rank).values('candidate_id')
+        )
+    if active_resume:
+        candidates = candidates.filter(has_active_resume=True)
+    return candidates
+
+
+def candidate_search_query(text):
+    """Поисковый запрос PostgreSQL в синтаксисе websearch: слова, "фразы", -исключения."""
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_candidates(candidates, text):
+    """
+    Кандидаты, у которых текст запроса встречается в имени, «о себе» или опыте работы.
+
+    В PostgreSQL фильтр идет по search_vector через GIN-индекс, поэтому его можно
+    передать в rank_candidates: поиск и ранжирование по вакансии остаются одним
+    индексным запросом. В других СУБД каждое слово ищется подстрокой в тех же полях.
+    """
+    if connection.vendor == 'postgresql':
+        return candidates.filter(search_vector=candidate_search_query(text))
+    for word in text.split():
+        candidates = candidates.filter(
+            Q(full_name__icontains=word)
+            | Q(about__icontains=word)
+            | Q(id__in=Experience.objects.filter(about__icontains=word).values('candidate_id'))
+        )
+    return candidates
+
+
+def order_by_search_rank(candidates, text):
+    """Сортировка найденных кандидатов по текстовой релевантности, вне PostgreSQL — по id."""
+    if connection.vendor == 'postgresql':
+        rank = SearchRank(F('search_vector'), candidate_search_query(text))
+        return candidates.annotate(search_rank=rank).order_by('-search_rank', 'id')
+    return candidates.order_by('id')
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from authorization.principal import bump_claims_version
+
+from .models import (
+    HR, Candidate, CandidateSkill, Company, CompanyMaturityAnswer, Education, Experience,
+    MaturityQuestion, Resume, Skill, VacancySkill,
+    candidate_skill_signals_muted, invalidate_match_scores, recalculate_candidate_maturity,
+    recalculate_companies_maturity, update_search_vectors,
+)
+from .profile_cache import bump_profile_version
+
+
+@receiver(post_save, sender=CandidateSkill)
+@receiver(post_delete, sender=CandidateSkill)
+def candidate_skill_changed(sender, instance, **kwargs):
+    if candidate_skill_signals_muted.get():
+        return
+    recalculate_candidate_maturity([instance.candidate_id])
+    invalidate_match_scores(candidate_ids=[instance.candidate_id])
+
+
+@receiver(post_save, sender=VacancySkill)
+@receiver(post_delete, sender=VacancySkill)
+def vacancy_skill_changed(sender, instance, **kwargs):
+    invalidate_match_scores(vacancy_ids=[instance.vacancy_id])
+
+
+@receiver(post_save, sender=Resume)
+@receiver(post_delete, sender=Resume)
+def resume_changed(sender, instance, **kwargs):
+    # Релевантность зависит от резюме только через наличие активного, то есть через агрегаты кандидата
+    changed = recalculate_candidate_maturity([instance.candidate_id])
+    if changed:
+        invalidate_match_scores(candidate_ids=changed)
+
+
+@receiver(pre_save, sender=Skill)
+def remember_skill_weight(sender, instance, **kwargs):
+    """Запоминает, изменился ли вес навыка, чтобы не пересчитывать зрелость при правке названия."""
+    old_weight = None
+    if instance.pk is not None:
+        old_weight = Skill.objects.filter(pk=instance.pk).values_list('weight', flat=True).first()
+    instance._weight_changed = old_weight is not None and old_weight != instance.weight
+
+
+@receiver(post_save, sender=Skill)
+def skill_weight_changed(sender, instance, created, **kwargs):
+    if getattr(instance, '_weight_changed', False):
+        holders = list(CandidateSkill.objects.filter(skill=instance).values_list('candidate_id', flat=True).distinct())
+        recalculate_candidate_maturity(holders)
+        # Вес навыка входит в зрелость его владельцев и в общий вес вакансий, где он требуется
+        invalidate_match_scores(
+            candidate_ids=holders,
+            vacancy_ids=list(VacancySkill.objects.filter(skill=instance).values_list('vacancy_id', flat=True)),
+        )
+
+
+@receiver(pre_save, sender=MaturityQuestion)
+def remember_question_weight(sender, instance, **kwargs):
+    """Запоминает, изменился ли вес вопроса анкеты цифровой зрелости."""
+    old_weight = None
+    if instance.pk is not None:
+        old_weight = MaturityQuestion.objects.filter(pk=instance.pk).values_list('weight', flat=True).first()
+    instance._weight_changed = old_weight is not None and old_weight != instance.weight
+
+
+@receiver(post_save, sender=MaturityQuestion)
+def question_weight_changed(sender, instance, created, **kwargs):
+    if getattr(instance, '_weight_changed', False):
+        recalculate_companies_maturity(
+            CompanyMaturityAnswer.objects.filter(question=instance).values('company_id')
+        )
+
+
+@receiver(pre_delete, sender=MaturityQuestion)
+def remember_question_companies(sender, instance, **kwargs):
+    # Ответы удаляются каскадно раньше post_delete, компании запоминаются заранее
+    instance._company_ids = list(
+        CompanyMaturityAnswer.objects.filter(question=instance).values_list('company_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=MaturityQuestion)
+def question_deleted(sender, instance, **kwargs):
+    company_ids = getattr(instance, '_company_ids', None)
+    if company_ids:
+        recalculate_companies_maturity(company_ids)
+
+
+@receiver(post_save, sender=Candidate)
+def candidate_text_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'full_name', 'about'} & set(update_fields):
+        update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+def experience_text_changed(sender, instance, **kwargs):
+    update_search_vectors([instance.candidate_id])
+
+
+# Версии кэша ProfileView: сбрасываются у пользователей, чьи профили показывают измененные данные
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_profile_version([instance.pk])
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_save, sender=HR)
+@receiver(post_delete, sender=HR)
+def profile_owner_changed(sender, instance, **kwargs):
+    bump_profile_version([instance.user_id])
+
+
+@receiver(post_save, sender=CandidateSkill)
+@receiver(post_delete, sender=CandidateSkill)
+@receiver(post_save, sender=Resume)
+@receiver(post_delete, sender=Resume)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+def candidate_profile_changed(sender, instance, **kwargs):
+    if sender is CandidateSkill and candidate_skill_signals_muted.get():
+        return
+    bump_profile_version(Candidate.objects.filter(pk=instance.candidate_id).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Skill)
+def skill_profile_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_profile_version(
+            Candidate.objects.filter(skills__skill=instance).values_list('user_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=Company)
+def company_profile_changed(sender, instance, created, **kwargs):
+    if not created:
+        # Компания видна в профиле своих HR и в опыте работы кандидатов
+        bump_profile_version(HR.objects.filter(company=instance).values_list('user_id', flat=True))
+        bump_profile_version(
+            Candidate.objects.filter(experience__company=instance).values_list('user_id', flat=True).distinct()
+        )
+
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_save, sender=HR)
+@receiver(post_delete, sender=HR)
+def role_changed(sender, instance, created=False, **kwargs):
+    """Роль пользователя подписана в его токенах и хранится в кэше аутентификации."""
+    # Правка данных кандидата роль не меняет, у HR может смениться компания
+    if sender is HR or created or kwargs['signal'] is post_delete:
+        bump_claims_version(instance.user_id)
@@ -0,0 +1,183 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков.
+
+При одном и том же зерне создаются одни и те же навыки, компании, кандидаты,
+резюме и вакансии; различаются только id. Данные пишутся массовыми INSERT
+частями, сигналы не отправляются, поэтому агрегаты зрелости считаются здесь же.
+"""
+import datetime
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from authorization.models import CustomUser
+from .models import (
+    HR, Candidate, CandidateSkill, Company, CompanyMaturityAnswer, Experience, MaturityQuestion, Resume, Skill,
+    Vacancy, VacancySkill, candidate_maturity_fields, recalculate_companies_maturity, update_search_vectors,
+)
+from .utils import context_maturity_level
+
+# Размер уровня — число кандидатов, остальные сущности масштабируются от него
+TIERS = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+
+SKILL_COUNT = 200
+QUESTION_COUNT = 20
+
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Иван', 'Ольга', 'Павел', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков']
+WORDS = [
+    'разработка', 'аналитика', 'данные', 'python', 'django', 'sql', 'инфраструктура', 'тестирование',
+    'автоматизация', 'интеграция', 'отчетность', 'облако', 'безопасность', 'продукт', 'команда',
+]
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def generate_dataset(candidates, seed=0, chunk_size=5000, batch_size=1000):
+    """
+    Создает синтетический набор данных на candidates кандидатов.
+
+    На каждые 10 кандидатов приходится вакансия, на каждые 100 — компания с HR.
+    У кандидата 3–12 навыков, у вакансии 3–8; 80% кандидатов с активным резюме,
+    10% — только с неактивным.
+
+    Returns:
+        dict: id созданных объектов — candidate_user_ids, hr_user_ids, staff_user_id,
+        vacancy_ids, question_ids.
+    """
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        skills = Skill.objects.bulk_create(
+            [
+                Skill(title=f'Навык {i}', description=text(rng, 5), weight=round(rng.uniform(0.5, 2.0), 2))
+                for i in range(SKILL_COUNT)
+            ],
+            batch_size=batch_size,
+        )
+        questions = MaturityQuestion.objects.bulk_create(
+            [MaturityQuestion(text=f'Вопрос {i}', weight=rng.choice([0.5, 1.0, 2.0])) for i in range(QUESTION_COUNT)]
+        )
+        companies = Company.objects.bulk_create(
+            [Company(name=f'Компания {i}', maturity_level=0) for i in range(max(candidates // 100, 10))],
+            batch_size=batch_size,
+        )
+        CompanyMaturityAnswer.objects.bulk_create(
+            [
+                CompanyMaturityAnswer(company=company, question=question, answer_value=round(rng.random(), 3))
+                for company in companies
+                for question in questions
+            ],
+            batch_size=batch_size,
+        )
+        recalculate_companies_maturity([company.pk for company in companies])
+
+        hr_users = CustomUser.objects.bulk_create(
+            [CustomUser(email=f'bench-hr-{i}@example.com', password=make_password(None)) for i in range(len(companies))],
+            batch_size=batch_size,
+        )
+        HR.objects.bulk_create(
+            [HR(user=user, company=company) for user, company in zip(hr_users, companies)], batch_size=batch_size,
+        )
+        staff = CustomUser.objects.create(email='bench-staff@example.com', password=make_password(None), is_staff=True)
+
+        vacancies = Vacancy.objects.bulk_create(
+            [
+                Vacancy(title=f'Вакансия {i}', company=rng.choice(companies), description=text(rng, 20))
+                for i in range(max(candidates // 10, 20))
+            ],
+            batch_size=batch_size,
+        )
+        VacancySkill.objects.bulk_create(
+            [
+                VacancySkill(vacancy=vacancy, skill=skill)
+                for vacancy in vacancies
+                for skill in rng.sample(skills, rng.randint(3, 8))
+            ],
+            batch_size=batch_size,
+        )
+
+    candidate_user_ids = []
+    for numbers in chunked(range(candidates), chunk_size):
+        with transaction.atomic():
+            candidate_user_ids += generate_candidates(rng, numbers, skills, companies, batch_size)
+
+    return {
+        'candidate_user_ids': candidate_user_ids,
+        'hr_user_ids': [user.pk for user in hr_users],
+        'staff_user_id': staff.pk,
+        'vacancy_ids': [vacancy.pk for vacancy in vacancies],
+        'question_ids': [question.pk for question in questions],
+    }
+
+
+def generate_candidates(rng, numbers, skills, companies, batch_size):
+    """Создает кандидатов с номерами numbers вместе с навыками, резюме и опытом; возвращает id пользователей."""
+    rows = []
+    for i in numbers:
+        ranks = [(skill, rng.randint(1, 5)) for skill in rng.sample(skills, rng.randint(3, 12))]
+        resume = rng.random()
+        rows.append({
+            'number': i,
+            'full_name': f'{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}',
+            'age': rng.randint(18, 65),
+            'about': text(rng, 15),
+            'skills': ranks,
+            'weighted_sum': sum(skill.weight * (rank / 5.0) for skill, rank in ranks),
+            'active_resume': resume < 0.8,
+            'inactive_resume': 0.8 <= resume < 0.9,
+            'experiences': [
+                (rng.choice(companies), datetime.date(2010, 1, 1) + datetime.timedelta(days=rng.randint(0, 5000)))
+                for _ in range(rng.randint(0, 2))
+            ],
+        })
+
+    users = CustomUser.objects.bulk_create(
+        [CustomUser(email=f"bench-candidate-{row['number']}@example.com", password=make_password(None)) for row in rows],
+        batch_size=batch_size,
+    )
+    created = Candidate.objects.bulk_create(
+        [
+            Candidate(
+                user=user, full_name=row['full_name'], age=row['age'], about=row['about'],
+                **candidate_maturity_fields(row['weighted_sum'], len(row['skills']), row['active_resume']),
+            )
+            for user, row in zip(users, rows)
+        ],
+        batch_size=batch_size,
+    )
+    CandidateSkill.objects.bulk_create(
+        [CandidateSkill(candidate=candidate, skill=skill, rank=rank) for candidate, row in zip(created, rows)
+         for skill, rank in row['skills']],
+        batch_size=batch_size,
+    )
+    Resume.objects.bulk_create(
+        [
+            Resume(
+                candidate=candidate, is_active=row['active_resume'],
+                digital_maturity=context_maturity_level(row['weighted_sum'], len(row['skills'])),
+            )
+            for candidate, row in zip(created, rows) if row['active_resume'] or row['inactive_resume']
+        ],
+        batch_size=batch_size,
+    )
+    Experience.objects.bulk_create(
+        [
+            Experience(candidate=candidate, company=company, hire_date=hire_date, about=text(rng, 10))
+            for candidate, row in zip(created, rows)
+            for company, hire_date in row['experiences']
+        ],
+        batch_size=batch_size,
+    )
+    update_search_vectors([candidate.pk for candidate in created])
+    return [user.pk for user in users]
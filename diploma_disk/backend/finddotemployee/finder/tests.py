@@ -1,3 +1,1201 @@
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.test import APIClient
+
+from authorization import urls as authorization_urls
+from authorization.models import CustomUser, RefreshToken
+from authorization.user_cache import user_cache
+from finddotemployee.metrics import registry
+
+from .models import (
+    HR, Candidate, CandidateSkill, CandidateVacancyScore, Company, CompanyMaturityAnswer, DisciplineFeedback,
+    Education, Experience, MaturityQuestion, Resume, Skill, Vacancy, VacancySkill,
+    invalidate_match_scores, recalculate_candidate_maturity, recalculate_companies_maturity, recalculate_company_maturity,
+    save_candidate_skills,
+)
+from . import urls as finder_urls
+from .pagination import RankingCursorPagination
+from .profile_cache import bump_profile_version
+from .serializers import ResumeWriteSerializer, VacancySerializer
+from .management.commands.benchmark_matching import Benchmark
+from .synthetic import generate_dataset
+from .services import (
+    add_match_and_sort, fill_match_scores, get_vacancy_skills, rank_candidates,
+)
+from .utils import blend_components, calculate_match_score, skill_match_score, skills_maturity_level
+
+
+def create_candidates(count, skills, offset=0):
+    """Создает кандидатов с детерминированным набором навыков и резюме."""
+    candidates = []
+    for i in range(offset, offset + count):
+        user = CustomUser.objects.create(email=f'candidate{i}@example.com')
+        candidate = Candidate.objects.create(user=user, full_name=f'Кандидат {i}', age=20 + i % 30, about='')
+        for j, skill in enumerate(skills):
+            if (i + j) % 3:
+                CandidateSkill.objects.create(candidate=candidate, skill=skill, rank=1 + (i * 7 + j) % 5)
+        if i % 4:
+            Resume.objects.create(candidate=candidate, is_active=bool(i % 5))
+        candidates.append(candidate)
+    return candidates
+
+
+def walk_after(ranked, size):
+    """Весь рейтинг страницами по size через after, как его читает курсорная пагинация."""
+    pages, key = [], None
+    while True:
+        page = ranked.after(key, size)
+        pages.extend(page)
+        if len(page) < size:
+            return pages
+        key = page[-1].ranking_key
+
+
+def raw_match_score(candidate, vacancy, maturity_weight):
+    """Неокругленный итоговый балл, по которому сортируется рейтинг."""
+    skill_score = skill_match_score({cs.skill_id: cs.rank / 5.0 for cs in candidate.skills.all()}, get_vacancy_skills(vacancy))
+    candidate._vacancy_context = vacancy
+    return blend_components(round(skill_score, 9), candidate.digital_maturity_score / 4.0, maturity_weight)
+
+
+class MatchingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Компания', maturity_level=2)
+        cls.skills = [
+            Skill.objects.create(title=f'Навык {i}', description='', weight=0.2 + 0.15 * i)
+            for i in range(6)
+        ]
+        cls.vacancy = Vacancy.objects.create(title='Вакансия', company=cls.company, description='')
+        for skill in cls.skills[:3]:
+            VacancySkill.objects.create(vacancy=cls.vacancy, skill=skill)
+        cls.candidates = create_candidates(12, cls.skills)
+        cls.hr_user = CustomUser.objects.create(email='hr@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.hr_user)
+
+
+class RankCandidatesTests(MatchingTestCase):
+    def test_scores_match_calculate_match_score(self):
+        for maturity_weight in (0.0, 0.3, 1.0):
+            ranked = list(rank_candidates(self.vacancy, maturity_weight=maturity_weight))
+            self.assertEqual(len(ranked), len(self.candidates))
+            for candidate in ranked:
+                fresh = Candidate.objects.get(pk=candidate.pk)
+                self.assertEqual(
+                    candidate.match_score,
+                    calculate_match_score(fresh, self.vacancy, maturity_weight),
+                )
+
+    def test_pages_follow_score_then_id(self):
+        create_candidates(6, self.skills[3:], offset=50)  # кандидаты без общих навыков
+        matched = set(CandidateSkill.objects.filter(skill__in=self.skills[:3]).values_list('candidate_id', flat=True))
+        for maturity_weight in (0.0, 0.3, 1.0):
+            expected = sorted(
+                (-raw_match_score(c, self.vacancy, maturity_weight), c.pk not in matched, c.pk)
+                for c in Candidate.objects.all()
+            )
+            ranked = rank_candidates(self.vacancy, maturity_weight=maturity_weight)
+            pages = walk_after(ranked, 5)
+            self.assertEqual([c.pk for c in pages], [pk for _, _, pk in expected])
+            self.assertEqual([c.match_score for c in pages], [round(-score, 3) for score, _, _ in expected])
+
+    def test_zero_overlap_tail_is_ranked_lazily(self):
+        outsider = create_candidates(1, self.skills[3:], offset=50)[0]
+        ranked = rank_candidates(self.vacancy, maturity_weight=0.0)
+        with CaptureQueriesContext(connection) as queries:
+            ranked.after(None, 3)
+        self.assertFalse(any('NOT' in q['sql'] for q in queries.captured_queries))
+        last = walk_after(ranked, 5)[-1]
+        self.assertEqual(last.pk, outsider.pk)
+        self.assertEqual(last.match_score, 0.0)
+
+    def test_ranking_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            rank_candidates(self.vacancy).after(None, 5)
+        create_candidates(10, self.skills, offset=100)
+        with CaptureQueriesContext(connection) as large:
+            page = rank_candidates(self.vacancy).after(None, 5)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(len(small), len(large))
+
+    def test_recommendations_sorted_before_pagination(self):
+        response = self.client.get(f'/api/recommendations/resumes/{self.vacancy.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(self.candidates))
+        best = max(calculate_match_score(c, self.vacancy) for c in Candidate.objects.all())
+        scores = [row['match_score'] for row in response.data['results']]
+        self.assertEqual(scores[0], best)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+@mock.patch.object(RankingCursorPagination, 'page_size', 4)
+class RankingCursorPaginationTests(MatchingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_candidates(6, cls.skills[3:], offset=50)  # кандидаты без общих навыков
+        HR.objects.create(user=cls.hr_user, company=cls.company)
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+
+    def walk(self, params):
+        url, pages = f'/api/recommendations/resumes/{self.vacancy.pk}/', []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data['results'])
+            url, params = response.data['next'], None
+        return pages
+
+    def test_pages_follow_ranking(self):
+        for maturity_weight in (0.0, 0.3, 1.0):
+            expected = [(c.pk, c.match_score) for c in rank_candidates(self.vacancy, maturity_weight=maturity_weight)]
+            pages = self.walk({'maturity_weight': maturity_weight})
+            self.assertTrue(all(len(page) <= 4 for page in pages))
+            self.assertEqual([(row['id'], row['match_score']) for page in pages for row in page], expected)
+
+    def test_after_matches_full_ranking(self):
+        ranked = rank_candidates(self.vacancy)
+        everything = list(ranked)
+        for position, candidate in enumerate(everything):
+            self.assertEqual(
+                [c.pk for c in ranked.after(candidate.ranking_key, 3)],
+                [c.pk for c in everything[position + 1:position + 4]],
+            )
+
+    def test_min_score(self):
+        everything = list(rank_candidates(self.vacancy))
+        for min_score in (0.0, 0.075, 0.3, everything[2].ranking_key[0], 2.0):
+            expected = [c.pk for c in everything if c.ranking_key[0] >= min_score]
+            ranked = rank_candidates(self.vacancy, min_score=min_score)
+            self.assertEqual([c.pk for c in ranked], expected)
+            self.assertEqual([c.pk for c in walk_after(ranked, 3)], expected)
+            self.assertEqual([c.pk for c in ranked.after(None, 100)], expected)
+
+    def test_filters_in_sql(self):
+        everything = list(rank_candidates(self.vacancy))
+        ranks = {
+            (cs.candidate_id, cs.skill_id): cs.rank for cs in CandidateSkill.objects.all()
+        }
+        cases = [
+            ({'min_maturity': 2}, lambda c: c.digital_maturity >= 2),
+            ({'min_age': 25, 'max_age': 30}, lambda c: 25 <= c.age <= 30),
+            ({'active_resume': 'true'}, lambda c: c.has_active_resume),
+            (
+                {'skills': f'{self.skills[0].pk},{self.skills[4].pk}', 'min_skill_rank': 2},
+                lambda c: all(ranks.get((c.pk, s.pk), 0) >= 2 for s in (self.skills[0], self.skills[4])),
+            ),
+            ({'min_score': 0.2, 'active_resume': '1'}, lambda c: c.ranking_key[0] >= 0.2 and c.has_active_resume),
+        ]
+        for params, keep in cases:
+            expected = [c.pk for c in everything if keep(c)]
+            self.assertTrue(0 < len(expected) < len(everything), params)
+            pages = self.walk(params)
+            self.assertEqual([row['id'] for page in pages for row in page], expected, params)
+
+    def test_invalid_filter(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/'
+        self.assertEqual(self.client.get(url, {'skills': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'min_score': 'high'}).status_code, 400)
+
+    def test_stream_matches_pages(self):
+        empty = Vacancy.objects.create(title='Без навыков', company=self.company, description='')
+        for vacancy, maturity_weight, min_score in ((self.vacancy, 0.3, None), (self.vacancy, 1.0, 0.5), (empty, 0.3, None)):
+            ranked = rank_candidates(vacancy, maturity_weight=maturity_weight, min_score=min_score)
+            expected = [(c.ranking_key, c.match_score, c.vacancy_maturity_score) for c in walk_after(ranked, 3)]
+            streamed = [(c.ranking_key, c.match_score, c.vacancy_maturity_score) for c in ranked.stream(chunk_size=5)]
+            self.assertEqual(streamed, expected)
+
+    def export(self, params):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/export/'
+        response = self.client.get(url, params, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        expected = [(c.pk, c.match_score) for c in rank_candidates(self.vacancy, maturity_weight=0.5)]
+        response, body = self.export({'maturity_weight': 0.5})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['id'], row['match_score']) for row in rows], expected)
+        candidate = self.candidates[1]
+        row = next(row for row in rows if row['id'] == candidate.pk)
+        self.assertEqual(row['skills'], {cs.skill.title: cs.rank for cs in candidate.skills.order_by('id')})
+        self.assertEqual(row['email'], candidate.user.email)
+
+    def test_export_csv_with_filters(self):
+        expected = [c.pk for c in rank_candidates(self.vacancy) if c.age >= 25]
+        response, body = self.export({'output': 'csv', 'min_age': 25})
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([int(row['id']) for row in rows], expected)
+        self.assertRegex(rows[0]['skills'], r'^Навык \d:\d(;Навык \d:\d)*$')
+
+    def test_export_invalid_output(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/export/'
+        self.assertEqual(self.client.get(url, {'output': 'xml'}).status_code, 400)
+
+    def test_export_only_for_hr_and_staff(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/export/'
+        self.client.force_authenticate(self.candidates[0].user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(CustomUser.objects.create(email='staff@example.com', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_page_cost_is_constant(self):
+        ranked = rank_candidates(self.vacancy)
+        everything = list(ranked)
+        costs = []
+        for key in (None, everything[3].ranking_key, everything[len(everything) - 6].ranking_key):
+            with CaptureQueriesContext(connection) as queries:
+                ranked.after(key, 5)
+            self.assertFalse(any('COUNT' in q['sql'] or 'OFFSET' in q['sql'] for q in queries.captured_queries))
+            costs.append(len(queries))
+        self.assertLessEqual(max(costs), 6)
+
+    def test_cursor_is_stable_while_scores_change(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/'
+        first = self.client.get(url).data
+        seen = [row['id'] for row in first['results']]
+        # Кандидат со страницы поднимается еще выше, другой — с дальней страницы — тоже
+        for pk in (seen[1], Candidate.objects.order_by('-id').values_list('id', flat=True)[0]):
+            for skill in self.skills[:3]:
+                CandidateSkill.objects.update_or_create(candidate_id=pk, skill=skill, defaults={'rank': 5})
+        response = self.client.get(first['next'])
+        self.assertEqual(response.status_code, 200)
+        later = [row['id'] for row in response.data['results']]
+        self.assertFalse(set(seen) & set(later))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/recommendations/resumes/{self.vacancy.pk}/', {'cursor': 'bm9wZQ=='})
+        self.assertEqual(response.status_code, 404)
+
+
+class CandidateSerializerQueryTests(MatchingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.add_history(cls.candidates)
+        cls.staff = CustomUser.objects.create(email='staff@example.com', is_staff=True)
+
+    @classmethod
+    def add_history(cls, candidates):
+        for candidate in candidates:
+            Education.objects.create(candidate=candidate, title='Программа', establishment='Вуз', avg_mark=4.5)
+            Experience.objects.create(
+                candidate=candidate, company=cls.company, hire_date=datetime.date(2020, 1, 1), about='',
+            )
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_candidate_list(self):
+        self.client.force_authenticate(self.staff)
+        small, rows = self.count_queries('/api/candidates/')
+        self.assertEqual(len(rows), 12)
+        self.add_history(create_candidates(12, self.skills, offset=100))
+        large, rows = self.count_queries('/api/candidates/')
+        self.assertEqual(len(rows), 24)
+        self.assertEqual(small, large)
+        self.assertEqual(rows[0]['experience'][0]['company'], self.company.name)
+
+    def test_recommendations(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/'
+        self.client.get(url)  # Заполняет сохраненные баллы
+        counts = []
+        for page_size in (2, 8):
+            with mock.patch.object(RankingCursorPagination, 'page_size', page_size):
+                count, rows = self.count_queries(url)
+            self.assertEqual(len(rows), page_size)
+            counts.append(count)
+        self.assertEqual(counts[0], counts[1])
+
+
+class ProfileViewTests(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.candidate = self.candidates[1]
+        self.client.force_authenticate(self.candidate.user)
+
+    def test_built_with_prefetch(self):
+        for skill in self.skills:
+            CandidateSkill.objects.get_or_create(candidate=self.candidate, skill=skill, defaults={'rank': 3})
+        Resume.objects.create(candidate=self.candidate, name='Второе')
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.data['role'], 'candidate')
+        self.assertEqual(len(response.data['candidate']['skills']), len(self.skills))
+        self.assertEqual(len(response.data['resumes'][0]['skills']), len(self.skills))
+
+    def test_cached_and_not_modified(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        # Версия читается из БД, ответ — из кэша
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+            response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_version_shared_between_processes(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        # Изменение из другого воркера или management-команды видно по версии в БД
+        Candidate.objects.filter(pk=self.candidate.pk).update(about='Обновлено в другом процессе')
+        bump_profile_version([self.candidate.user_id])
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['candidate']['about'], 'Обновлено в другом процессе')
+
+    def test_writes_bump_version(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        # Изменения чужого профиля версию не трогают
+        with self.captureOnCommitCallbacks(execute=True):
+            CandidateSkill.objects.create(candidate=self.candidates[2], skill=self.skills[5], rank=5)
+        self.assertEqual(self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            skill = self.candidate.skills.first().skill
+            skill.title = 'Переименованный навык'
+            skill.save()
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Переименованный навык', [row['title'] for row in response.data['candidate']['skills']])
+
+
+class RequestMetricsTests(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def timings(self, response):
+        return dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/recommendations/resumes/{self.vacancy.id}/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'view', 'render', 'match', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+
+    def test_metrics_endpoint(self):
+        self.client.get(f'/api/recommendations/resumes/{self.vacancy.id}/')
+        self.client.get('/api/recommendations/resumes/0/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.client.force_authenticate(CustomUser.objects.create(email='staff@example.com', is_staff=True))
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        route = 'route="api/recommendations/resumes/<int:vacancy_id>/"'
+        self.assertIn(f'http_request_duration_seconds_count{{{route},method="GET"}} 2', text)
+        self.assertIn(f'http_request_db_queries_bucket{{{route},method="GET",le="+Inf"}} 2', text)
+        self.assertIn(f'http_responses_total{{{route},method="GET",status="404"}} 1', text)
+        self.assertIn(f'http_request_stage_seconds_total{{{route},stage="match"}}', text)
+        self.assertIn('auth_user_cache_hits_total', text)
+
+
+class CachedRoleTests(MatchingTestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.hr_user.access_token}')
+
+    def test_role_follows_hr_changes(self):
+        other = Company.objects.create(name='Другая компания', maturity_level=1)
+        Vacancy.objects.create(title='Чужая вакансия', company=other, description='')
+        self.assertEqual(len(self.client.get('/api/vacancies/').data['results']), 2)
+
+        hr = HR.objects.create(user=self.hr_user, company=self.company)
+        with self.assertNumQueries(4):  # кэш-промах после сброса, COUNT, вакансия и ее навыки
+            response = self.client.get('/api/vacancies/')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.vacancy.pk])
+
+        hr.delete()
+        self.assertEqual(len(self.client.get('/api/vacancies/').data['results']), 2)
+
+    def test_vacancy_created_for_claimed_company(self):
+        HR.objects.create(user=self.hr_user, company=self.company)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.hr_user.access_token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/vacancies/', {'title': 'Новая', 'description': 'Описание', 'skills': [self.skills[0].pk]}, format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Vacancy.objects.get(title='Новая').company, self.company)
+        self.assertFalse(any('finder_hr' in q['sql'] for q in queries.captured_queries))
+
+
+class MaturityAnswersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Компания', maturity_level=0)
+        cls.questions = [MaturityQuestion.objects.create(text=f'Вопрос {i}', weight=1 + i % 3) for i in range(50)]
+        user = CustomUser.objects.create(email='hr@example.com')
+        HR.objects.create(user=user, company=cls.company)
+        cls.user = CustomUser.objects.get(pk=user.pk)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.user.access_token}')
+
+    def submit(self, answers):
+        return self.client.post('/api/digital-maturity/submit/', answers, format='json')
+
+    def test_bulk_upsert(self):
+        answers = [{'question_id': q.pk, 'answer_value': 0.2} for q in self.questions]
+        self.submit(answers)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.submit([dict(answer, answer_value=0.9) for answer in answers])
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(CompanyMaturityAnswer.objects.filter(company=self.company).count(), 50)
+        self.assertEqual(set(CompanyMaturityAnswer.objects.values_list('answer_value', flat=True)), {0.9})
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.maturity_level, 4)
+
+    def test_unknown_question_rejected(self):
+        response = self.submit([{'question_id': self.questions[0].pk, 'answer_value': 1}, {'question_id': 0, 'answer_value': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CompanyMaturityAnswer.objects.exists())
+
+    def test_only_hr(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {CustomUser.objects.create(email="x@example.com").access_token}')
+        self.assertEqual(self.submit([]).status_code, 403)
+
+
+class CompanyMaturityRecalculationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(3)
+        cls.questions = [MaturityQuestion.objects.create(text=f'Вопрос {i}', weight=1 + i % 3) for i in range(5)]
+        cls.companies = [Company.objects.create(name=f'Компания {i}', maturity_level=0) for i in range(12)]
+        for company in cls.companies[:10]:
+            for question in cls.questions:
+                CompanyMaturityAnswer.objects.create(company=company, question=question, answer_value=rng.random())
+        # Граница уровня и компания только с ответом на вопрос нулевого веса
+        CompanyMaturityAnswer.objects.filter(company=cls.companies[0]).update(answer_value=0.5)
+        zero = MaturityQuestion.objects.create(text='Без веса', weight=0)
+        CompanyMaturityAnswer.objects.create(company=cls.companies[10], question=zero, answer_value=1)
+
+    def levels(self):
+        return dict(Company.objects.values_list('pk', 'maturity_level'))
+
+    def expected_levels(self):
+        for company in self.companies:
+            recalculate_company_maturity(company)
+        return self.levels()
+
+    def test_bulk_matches_single(self):
+        expected = self.expected_levels()
+        self.assertEqual(expected[self.companies[0].pk], 2)
+        self.assertEqual(expected[self.companies[10].pk], 0)
+        self.assertEqual(expected[self.companies[11].pk], 0)
+
+        Company.objects.update(maturity_level=3)
+        with self.assertNumQueries(2):
+            self.assertEqual(recalculate_companies_maturity(), 12)
+        self.assertEqual(self.levels(), expected)
+
+    def test_only_given_companies(self):
+        recalculate_companies_maturity([self.companies[1].pk])
+        levels = self.levels()
+        self.assertNotEqual(levels[self.companies[1].pk], 0)
+        self.assertEqual(levels[self.companies[2].pk], 0)
+
+    def assertRecalculated(self, stored):
+        """Пересчитаны только компании с ответом на измененный вопрос."""
+        expected = self.expected_levels()
+        for company in self.companies[:10]:
+            self.assertEqual(stored[company.pk], expected[company.pk])
+        for company in self.companies[10:]:
+            self.assertEqual(stored[company.pk], -1)
+
+    def test_question_weight_change(self):
+        Company.objects.update(maturity_level=-1)
+        question = self.questions[0]
+        question.text = 'Новый текст'
+        question.save()
+        self.assertEqual(set(self.levels().values()), {-1})
+
+        question.weight = 20
+        question.save()
+        self.assertRecalculated(self.levels())
+
+    def test_question_deleted(self):
+        Company.objects.update(maturity_level=-1)
+        self.questions[1].delete()
+        self.assertRecalculated(self.levels())
+
+    def test_command(self):
+        call_command('recalculate_company_maturity', stdout=io.StringIO())
+        stored = self.levels()
+        self.assertEqual(stored, self.expected_levels())
+
+
+class ImportDataTests(TestCase):
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_import(self, kind, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_data', kind, path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.run_import('skills', self.write('skills.csv', 'title,description,weight\nPython,,0.8\nSQL,,0.5\nGo,,x\n'))
+
+    def test_skills(self):
+        self.assertEqual(dict(Skill.objects.values_list('title', 'weight')), {'Python': 0.8, 'SQL': 0.5})
+
+    def test_candidates_jsonl(self):
+        CustomUser.objects.create(email='taken@example.com')
+        lines = [
+            {'email': f'c{i}@example.com', 'full_name': f'Кандидат {i}', 'age': 20 + i,
+             'skills': {'Python': 1 + i % 5, 'SQL': 5 - i % 5}, 'active_resume': i % 2 == 0}
+            for i in range(5)
+        ] + [
+            {'email': 'taken@example.com', 'full_name': 'Занят', 'age': 30},
+            {'email': 'x@example.com', 'full_name': 'Неизвестный навык', 'age': 30, 'skills': {'Rust': 3}},
+            {'email': 'y@example.com', 'full_name': 'Без возраста'},
+        ]
+        path = self.write('candidates.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\n{oops\n')
+        out, err = self.run_import('candidates', path, chunk_size=3, batch_size=2)
+
+        self.assertIn('импортировано 5, пропущено 4', out)
+        self.assertEqual(err.count('Строка'), 4)
+        self.assertEqual(Candidate.objects.count(), 5)
+        self.assertEqual(CandidateSkill.objects.count(), 10)
+        for candidate in Candidate.objects.all():
+            skills = [(cs.skill_id, cs.skill.weight * cs.rank / 5.0) for cs in candidate.skills.order_by('id')]
+            self.assertEqual(candidate.has_active_resume, candidate.resumes.filter(is_active=True).exists())
+            expected = skills_maturity_level(skills) if candidate.has_active_resume else 1
+            self.assertEqual(candidate.digital_maturity, expected)
+        # Поля, посчитанные при импорте, совпадают с пересчетом по сохраненным навыкам
+        resume_levels = dict(Resume.objects.values_list('id', 'digital_maturity'))
+        self.assertEqual(recalculate_candidate_maturity(Candidate.objects.values_list('id', flat=True)), [])
+        self.assertEqual(dict(Resume.objects.values_list('id', 'digital_maturity')), resume_levels)
+
+    def test_queries_per_chunk(self):
+        counts = []
+        for offset, size in ((0, 10), (100, 40)):
+            rows = ''.join(f'c{i}@example.com,Кандидат {i},30,Python:3;SQL:4\n' for i in range(offset, offset + size))
+            path = self.write('candidates.csv', 'email,full_name,age,skills\n' + rows)
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import('candidates', path, batch_size=100)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_vacancies_csv(self):
+        Company.objects.create(name='Есть', maturity_level=2)
+        path = self.write('vacancies.csv', (
+            'title,company,description,skills\n'
+            'Аналитик,Есть,,SQL\n'
+            'Разработчик,Новая,Бэкенд,Python;SQL\n'
+            'Тестировщик,Новая,,Java\n'
+        ))
+        out, err = self.run_import('vacancies', path)
+        self.assertIn('неизвестные навыки: Java', err)
+        self.assertEqual(Company.objects.count(), 2)
+        self.assertEqual(
+            sorted(Vacancy.objects.values_list('title', 'company__name')), [('Аналитик', 'Есть'), ('Разработчик', 'Новая')],
+        )
+        self.assertEqual(VacancySkill.objects.filter(vacancy__title='Разработчик').count(), 2)
+
+
+class SyntheticDatasetTests(TestCase):
+    def snapshot(self):
+        return (
+            list(Candidate.objects.order_by('id').values_list(
+                'full_name', 'age', 'digital_maturity', 'unmatched_maturity', 'has_active_resume',
+            )),
+            list(CandidateSkill.objects.order_by('id').values_list('candidate__full_name', 'skill__title', 'rank')),
+            list(VacancySkill.objects.order_by('id').values_list('vacancy__title', 'skill__title')),
+            list(Company.objects.order_by('id').values_list('name', 'maturity_level')),
+        )
+
+    def test_deterministic(self):
+        snapshots = []
+        for _ in range(2):
+            with transaction.atomic():
+                generate_dataset(30, seed=7, chunk_size=10)
+                snapshots.append(self.snapshot())
+                transaction.set_rollback(True)
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertEqual(len(snapshots[0][0]), 30)
+        # Агрегаты, посчитанные генератором, совпадают с пересчетом по сохраненным навыкам
+        generate_dataset(30, seed=7)
+        self.assertEqual(recalculate_candidate_maturity(Candidate.objects.values_list('id', flat=True)), [])
+
+    def test_benchmark(self):
+        results = Benchmark(generate_dataset(30), repeat=2).run()
+        self.assertEqual(len(results), 10)
+        for result in results:
+            self.assertEqual(result['runs'], 2)
+            self.assertLessEqual(result['p50_ms'], result['max_ms'])
+        profile = {result['name']: result['queries_max'] for result in results}
+        self.assertEqual(profile['ProfileView (If-None-Match)'], 1)
+
+
+class DigitalMaturityTests(MatchingTestCase):
+    def expected_level(self, candidate):
+        skills = [
+            (cs.skill_id, cs.skill.weight * (cs.rank / 5.0))
+            for cs in candidate.skills.select_related('skill').order_by('id')
+        ]
+        return skills_maturity_level(skills) if candidate.resumes.filter(is_active=True).exists() else 1
+
+    def assertStoredLevels(self):
+        for candidate in Candidate.objects.all():
+            self.assertEqual(candidate.digital_maturity, self.expected_level(candidate), candidate.full_name)
+
+    def test_stored_on_skill_and_resume_changes(self):
+        self.assertStoredLevels()
+        candidate = self.candidates[1]
+        CandidateSkill.objects.create(candidate=candidate, skill=self.skills[5], rank=5)
+        candidate.resumes.update(is_active=True)
+        Resume.objects.create(candidate=candidate)
+        self.assertStoredLevels()
+        candidate.skills.first().delete()
+        self.assertStoredLevels()
+
+    def test_stored_on_skill_weight_change(self):
+        for skill in self.skills:
+            skill.weight = 1.0
+            skill.save()
+        self.assertStoredLevels()
+
+    def test_vacancy_context_uses_one_aggregate_query(self):
+        candidate = Candidate.objects.get(pk=self.candidates[1].pk)
+        candidate._vacancy_context = self.vacancy
+        with self.assertNumQueries(1):
+            candidate.digital_maturity_score
+
+    def test_read_without_queries(self):
+        candidate = Candidate.objects.get(pk=self.candidates[1].pk)
+        resumes = list(Resume.objects.all())
+        with self.assertNumQueries(0):
+            candidate.digital_maturity_score
+            [resume.digital_maturity_score for resume in resumes]
+
+
+class ResumeSkillWriteTests(MatchingTestCase):
+    def ranks(self, candidate):
+        return list(candidate.skills.order_by('id').values_list('skill_id', 'rank'))
+
+    def test_diff_keeps_other_skills(self):
+        candidate = self.candidates[1]  # Навыки 0, 1, 3, 4
+        before = self.ranks(candidate)
+        CandidateSkill.objects.create(candidate=candidate, skill=self.skills[1], rank=1)  # Дубль
+        fill_match_scores(self.vacancy, Candidate.objects.all())
+
+        save_candidate_skills(candidate, {self.skills[0].pk: 5, self.skills[1].pk: 2, self.skills[2].pk: 4})
+        expected = [(self.skills[0].pk, 5), (self.skills[1].pk, 2), *before[2:], (self.skills[2].pk, 4)]
+        self.assertEqual(self.ranks(candidate), expected)
+        self.assertFalse(CandidateVacancyScore.objects.filter(candidate=candidate).exists())
+        self.assertTrue(CandidateVacancyScore.objects.exclude(candidate=candidate).exists())
+
+        candidate.refresh_from_db()
+        skills = [(cs.skill_id, cs.skill.weight * cs.rank / 5.0) for cs in candidate.skills.order_by('id')]
+        self.assertEqual(candidate.digital_maturity, skills_maturity_level(skills))
+
+    def test_duplicates_removed_without_per_row_signals(self):
+        candidate = self.candidates[1]
+        for _ in range(3):
+            CandidateSkill.objects.create(candidate=candidate, skill=self.skills[1], rank=1)
+        with mock.patch('finder.signals.recalculate_candidate_maturity') as signal_recalculate, \
+                mock.patch('finder.signals.bump_profile_version') as signal_bump:
+            save_candidate_skills(candidate, {self.skills[1].pk: 2})
+        signal_recalculate.assert_not_called()
+        signal_bump.assert_not_called()
+        self.assertEqual(candidate.skills.filter(skill=self.skills[1]).count(), 1)
+
+    def test_queries_do_not_grow_with_skills(self):
+        counts = []
+        # У обоих кандидатов часть навыков уже есть, часть добавляется
+        for candidate, size in ((self.candidates[2], 2), (self.candidates[4], 6)):
+            ranks = {skill.pk: 1 + i % 5 for i, skill in enumerate(self.skills[:size])}
+            with CaptureQueriesContext(connection) as queries:
+                save_candidate_skills(candidate, ranks)
+            counts.append(len(queries))
+            self.assertEqual({k: v for k, v in self.ranks(candidate) if k in ranks}, ranks)
+        self.assertEqual(counts[0], counts[1])
+
+        with self.assertNumQueries(1):
+            save_candidate_skills(self.candidates[4], ranks)
+
+    def test_resume_api(self):
+        candidate = self.candidates[1]
+        self.client.force_authenticate(candidate.user)
+        response = self.client.post('/api/resumes/', {
+            'is_active': True,
+            'skills': [{'skill': self.skills[4].pk, 'rank': 2}, {'skill': self.skills[4].pk, 'rank': 3}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIn((self.skills[4].pk, 3), self.ranks(candidate))
+
+        resume = candidate.resumes.latest('id')
+        response = self.client.patch(
+            f'/api/resumes/{resume.pk}/', {'skills': [{'skill': self.skills[4].pk, 'rank': 5}]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIn((self.skills[4].pk, 5), self.ranks(candidate))
+
+
+class SkillIdListTests(MatchingTestCase):
+    def validate(self, skills):
+        serializer = VacancySerializer(data={'title': 'Новая', 'description': 'Описание', 'skills': skills})
+        return serializer.is_valid(), serializer
+
+    def test_one_query_for_list(self):
+        skill_ids = [skill.pk for skill in reversed(self.skills)]
+        with self.assertNumQueries(1):
+            valid, serializer = self.validate(skill_ids + [str(skill_ids[0])])
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(
+            [skill.pk for skill in serializer.validated_data['skills']], skill_ids + [skill_ids[0]],
+        )
+
+    def test_all_missing_ids_reported(self):
+        valid, serializer = self.validate([self.skills[0].pk, 0, 999999])
+        self.assertFalse(valid)
+        self.assertEqual(serializer.errors['skills'], ['Объекты не найдены: 0, 999999'])
+
+    def test_incorrect_type(self):
+        for value in (True, 'abc', {'id': 1}):
+            valid, serializer = self.validate([value])
+            self.assertFalse(valid)
+            self.assertEqual(serializer.errors['skills'][0].code, 'incorrect_type')
+
+    def test_resume_skills(self):
+        skills = [{'skill': skill.pk, 'rank': 3} for skill in self.skills]
+        serializer = ResumeWriteSerializer(data={'is_active': True, 'skills': skills})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['skills'][0]['skill'], self.skills[0])
+
+    def test_resume_skill_errors_per_item(self):
+        skills = [{'skill': self.skills[0].pk, 'rank': 3}, {'skill': 0, 'rank': 3}, {'skill': 'abc', 'rank': 3}]
+        serializer = ResumeWriteSerializer(data={'skills': skills})
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        errors = serializer.errors['skills']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1]['skill'][0].code, 'does_not_exist')
+        self.assertEqual(
+            errors[1]['skill'], [PrimaryKeyRelatedField.default_error_messages['does_not_exist'].format(pk_value=0)],
+        )
+        self.assertEqual(errors[2]['skill'][0].code, 'incorrect_type')
+
+
+class CandidateSearchTests(MatchingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Candidate.objects.filter(pk=cls.candidates[1].pk).update(about='Старший аналитик данных, Python')
+        Candidate.objects.filter(pk=cls.candidates[2].pk).update(about='Разработчик на Python')
+        Experience.objects.create(
+            candidate=cls.candidates[3], company=cls.company, hire_date=datetime.date(2020, 1, 1),
+            about='Писал на Python сервисы для аналитик платформы',
+        )
+
+    def search(self, text):
+        response = self.client.get('/api/search/candidates/', {'q': text})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item['id'] for item in response.data['results']]
+
+    def test_fields_and_words(self):
+        self.assertEqual(self.search('Python'), [c.pk for c in self.candidates[1:4]])
+        self.assertEqual(self.search('Python аналитик'), [self.candidates[1].pk, self.candidates[3].pk])
+        self.assertEqual(self.search('Кандидат 11'), [self.candidates[11].pk])
+        self.assertEqual(self.search('Rust'), [])
+
+    def test_empty_query(self):
+        self.assertEqual(self.client.get('/api/search/candidates/', {'q': ' '}).status_code, 400)
+
+    def test_combined_with_match_score(self):
+        url = f'/api/recommendations/resumes/{self.vacancy.pk}/'
+        ranked = [item['id'] for item in self.client.get(url).data['results']]
+        found = [item['id'] for item in self.client.get(url, {'q': 'Python'}).data['results']]
+        self.assertEqual(found, [pk for pk in ranked if pk in {c.pk for c in self.candidates[1:4]}])
+
+
+class CandidateVacancyScoreTests(MatchingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_vacancy = Vacancy.objects.create(title='Другая вакансия', company=cls.company, description='')
+        for skill in cls.skills[3:]:
+            VacancySkill.objects.create(vacancy=cls.other_vacancy, skill=skill)
+
+    def pairs(self):
+        return set(CandidateVacancyScore.objects.values_list('candidate_id', 'vacancy_id'))
+
+    def test_calculate_reads_without_writing(self):
+        candidate = Candidate.objects.get(pk=self.candidates[1].pk)
+        with CaptureQueriesContext(connection) as queries:
+            score = calculate_match_score(candidate, self.vacancy)
+        self.assertFalse(any(q['sql'].startswith('INSERT') for q in queries.captured_queries))
+        self.assertEqual(self.pairs(), set())
+
+        fill_match_scores(self.vacancy, Candidate.objects.filter(pk=candidate.pk))
+        self.assertEqual(self.pairs(), {(candidate.pk, self.vacancy.pk)})
+        candidate = Candidate.objects.get(pk=candidate.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(calculate_match_score(candidate, self.vacancy), score)
+
+    def test_zero_overlap_pair_without_row(self):
+        candidate = create_candidates(1, self.skills[3:], offset=70)[0]
+        Resume.objects.create(candidate=candidate, is_active=True)
+        candidate = Candidate.objects.get(pk=candidate.pk)
+        fill_match_scores(self.vacancy)
+        self.assertFalse(CandidateVacancyScore.objects.filter(candidate=candidate).exists())
+        # Поиск строки, навыки вакансии и агрегат общих навыков
+        with self.assertNumQueries(3):
+            score = calculate_match_score(candidate, self.vacancy)
+        self.assertEqual(score, round(raw_match_score(candidate, self.vacancy, 0.3), 3))
+        self.assertEqual(candidate.vacancy_maturity_score, candidate.unmatched_maturity)
+
+    def test_stale_version_rows_are_ignored(self):
+        fill_match_scores(self.vacancy)
+        candidate = self.candidates[1]
+        fresh = Candidate.objects.get(pk=candidate.pk)
+        expected = calculate_match_score(fresh, self.vacancy)
+        # Строка, записанная до смены версии кандидата, не должна читаться как актуальная
+        CandidateVacancyScore.objects.filter(candidate=candidate, vacancy=self.vacancy).update(
+            skill_match_score=0.0, maturity_score=0.0,
+        )
+        Candidate.objects.filter(pk=candidate.pk).update(score_version=F('score_version') + 1)
+        fresh = Candidate.objects.get(pk=candidate.pk)
+        self.assertEqual(calculate_match_score(fresh, self.vacancy), expected)
+        ranked = {c.pk: c.match_score for c in rank_candidates(self.vacancy)}
+        self.assertEqual(ranked[candidate.pk], expected)
+        row = CandidateVacancyScore.objects.get(candidate=candidate, vacancy=self.vacancy)
+        self.assertEqual(row.candidate_version, fresh.score_version)
+        self.assertEqual(fill_match_scores(self.vacancy), 0)
+
+    def test_save_keeps_score_version(self):
+        stale = Candidate.objects.get(pk=self.candidates[1].pk)
+        CandidateSkill.objects.create(candidate=stale, skill=self.skills[5], rank=5)
+        Resume.objects.create(candidate=stale, is_active=True)
+        fresh = Candidate.objects.get(pk=stale.pk)
+        self.assertGreater(fresh.score_version, stale.score_version)
+        self.assertNotEqual(fresh.digital_maturity, stale.digital_maturity)
+        stale.about = 'Новое описание'
+        stale.save()
+        saved = Candidate.objects.get(pk=stale.pk)
+        self.assertEqual(saved.about, 'Новое описание')
+        derived = ('score_version', 'digital_maturity', 'skill_weight_sum', 'skill_count', 'has_active_resume',
+                   'unmatched_maturity')
+        self.assertEqual([getattr(saved, name) for name in derived], [getattr(fresh, name) for name in derived])
+
+    def test_ranking_fills_once(self):
+        expected = {c.pk: c.match_score for c in rank_candidates(self.vacancy)}
+        self.assertTrue(CandidateVacancyScore.objects.filter(vacancy=self.vacancy).exists())
+        self.assertEqual(fill_match_scores(self.vacancy), 0)
+        self.assertEqual({c.pk: c.match_score for c in rank_candidates(self.vacancy)}, expected)
+
+    def test_components_serve_every_weight(self):
+        rank_candidates(self.vacancy)
+        for maturity_weight in (0.0, 0.5, 1.0):
+            with CaptureQueriesContext(connection) as queries:
+                page = rank_candidates(self.vacancy, maturity_weight=maturity_weight).after(None, 5)
+            self.assertFalse(any(q['sql'].startswith('INSERT') for q in queries.captured_queries))
+            expected = sorted(
+                (-raw_match_score(Candidate.objects.get(pk=c.pk), self.vacancy, maturity_weight), c.pk)
+                for c in Candidate.objects.filter(vacancy_scores__vacancy=self.vacancy)
+            )[:5]
+            self.assertEqual([c.pk for c in page], [pk for _, pk in expected])
+
+    def test_targeted_invalidation(self):
+        fill_match_scores(self.vacancy)
+        fill_match_scores(self.other_vacancy)
+        before = self.pairs()
+        candidate = self.candidates[1]
+
+        CandidateSkill.objects.filter(candidate=candidate).first().delete()
+        self.assertEqual(self.pairs(), {pair for pair in before if pair[0] != candidate.pk})
+
+        before = self.pairs()
+        VacancySkill.objects.create(vacancy=self.other_vacancy, skill=self.skills[0])
+        self.assertEqual(self.pairs(), {pair for pair in before if pair[1] != self.other_vacancy.pk})
+
+        fill_match_scores(self.other_vacancy)
+        before = self.pairs()
+        skill = self.skills[1]
+        holders = set(skill.candidateskill_set.values_list('candidate_id', flat=True))
+        skill.weight = 0.9
+        skill.save()
+        self.assertEqual(
+            self.pairs(),
+            {pair for pair in before if pair[0] not in holders and pair[1] == self.other_vacancy.pk},
+        )
+
+        # Правка названия навыка не влияет на релевантность
+        fill_match_scores(self.vacancy)
+        before = self.pairs()
+        skill.title = 'Новое название'
+        skill.save()
+        self.assertEqual(self.pairs(), before)
+
+    def test_invalidated_scores_are_recomputed(self):
+        rank_candidates(self.vacancy)
+        candidate = self.candidates[2]
+        CandidateSkill.objects.create(candidate=candidate, skill=self.skills[5], rank=5)
+        fresh = Candidate.objects.get(pk=candidate.pk)
+        ranked = {c.pk: c.match_score for c in rank_candidates(self.vacancy)}
+        CandidateVacancyScore.objects.filter(candidate=candidate).delete()
+        self.assertEqual(ranked[candidate.pk], calculate_match_score(fresh, self.vacancy))
+
+    def test_signal_less_writes_need_explicit_invalidation(self):
+        candidate = self.candidates[2]
+        before = {c.pk: c.match_score for c in rank_candidates(self.vacancy)}[candidate.pk]
+        # update() не отправляет сигналов: сохраненная релевантность остается прежней
+        CandidateSkill.objects.filter(candidate=candidate).update(rank=5)
+        self.assertEqual({c.pk: c.match_score for c in rank_candidates(self.vacancy)}[candidate.pk], before)
+
+        recalculate_candidate_maturity([candidate.pk])
+        invalidate_match_scores(candidate_ids=[candidate.pk])
+        ranked = {c.pk: c.match_score for c in rank_candidates(self.vacancy)}
+        fresh = Candidate.objects.get(pk=candidate.pk)
+        self.assertNotEqual(ranked[candidate.pk], before)
+        self.assertEqual(ranked[candidate.pk], calculate_match_score(fresh, self.vacancy))
+
+
+class RecommendVacanciesTests(MatchingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.mature_company = Company.objects.create(name='Зрелая компания', maturity_level=4)
+        for i in range(8):
+            vacancy = Vacancy.objects.create(
+                title=f'Вакансия {i}', company=cls.mature_company if i % 2 else cls.company, description='',
+            )
+            for j, skill in enumerate(cls.skills):
+                if (i + j) % 4 == 0:
+                    VacancySkill.objects.create(vacancy=vacancy, skill=skill)
+
+    def setUp(self):
+        super().setUp()
+        self.candidate = Candidate.objects.get(pk=self.candidates[1].pk)
+        self.client.force_authenticate(self.candidate.user)
+
+    def expected(self, vacancies):
+        return sorted(((-calculate_match_score(self.candidate, v), v.pk) for v in vacancies))
+
+    def test_top_vacancies(self):
+        expected = self.expected(Vacancy.objects.all())[:5]
+        response = self.client.get('/api/recommendations/vacancies/', {'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(-row['match_score'], row['id']) for row in response.data], expected)
+
+    def test_company_maturity_filter(self):
+        expected = self.expected(Vacancy.objects.filter(company=self.mature_company))
+        response = self.client.get('/api/recommendations/vacancies/', {'company_maturity_level': 4})
+        self.assertEqual([(-row['match_score'], row['id']) for row in response.data], expected)
+        response = self.client.get('/api/recommendations/vacancies/', {'min_company_maturity_level': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/recommendations/vacancies/')
+        for i in range(10):
+            VacancySkill.objects.create(
+                vacancy=Vacancy.objects.create(title=f'Еще {i}', company=self.company, description=''),
+                skill=self.skills[i % 6],
+            )
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/api/recommendations/vacancies/')
+        self.assertEqual(len(small), len(large))
+
+    def test_only_for_candidates(self):
+        self.client.force_authenticate(self.hr_user)
+        self.assertEqual(self.client.get('/api/recommendations/vacancies/').status_code, 403)
+
+    def test_add_match_and_sort(self):
+        vacancies = list(Vacancy.objects.all())
+        ranked = add_match_and_sort(vacancies, self.candidate)
+        self.assertEqual(
+            [v.match_score for v in ranked],
+            sorted((calculate_match_score(self.candidate, v) for v in vacancies), reverse=True),
+        )
+
+
+def seed_query_budget_data(size):
+    """
+    По size строк каждой сущности для проверки бюджетов запросов.
+
+    У каждого кандидата size навыков, резюме, образование, опыт и отзыв HR, у каждой
+    вакансии первой компании — size навыков; все HR работают в первой компании.
+    """
+    companies = [Company.objects.create(name=f'Компания {i}', maturity_level=2) for i in range(size)]
+    skills = [Skill.objects.create(title=f'Навык {i}', description='', weight=0.5 + 0.1 * i) for i in range(size)]
+    questions = [MaturityQuestion.objects.create(text=f'Вопрос {i}', weight=1.0) for i in range(size)]
+    hrs = [
+        HR.objects.create(user=CustomUser.objects.create(email=f'hr{i}@example.com'), company=companies[0])
+        for i in range(size)
+    ]
+    vacancies = []
+    for i in range(size):
+        vacancy = Vacancy.objects.create(title=f'Вакансия {i}', company=companies[0], description='')
+        VacancySkill.objects.bulk_create([VacancySkill(vacancy=vacancy, skill=skill) for skill in skills])
+        vacancies.append(vacancy)
+    candidates = []
+    for i in range(size):
+        user = CustomUser.objects.create(email=f'candidate{i}@example.com')
+        user.set_password('password123')
+        user.save()
+        candidate = Candidate.objects.create(user=user, full_name=f'Кандидат {i}', age=20 + i, about='Python')
+        save_candidate_skills(candidate, {skill.pk: 1 + (i + j) % 5 for j, skill in enumerate(skills)})
+        Resume.objects.create(candidate=candidate)
+        Education.objects.create(candidate=candidate, title='Программа', establishment='ВУЗ', avg_mark=4.5)
+        Experience.objects.create(candidate=candidate, company=companies[i], hire_date=datetime.date(2020, 1, 1), about='')
+        DisciplineFeedback.objects.create(candidate=candidate, hr=hrs[0], discipline='Python')
+        candidates.append(candidate)
+    CompanyMaturityAnswer.objects.bulk_create(
+        [CompanyMaturityAnswer(company=companies[0], question=question, answer_value=0.5) for question in questions]
+    )
+    return {
+        'users': {
+            'staff': CustomUser.objects.create(email='staff@example.com', is_staff=True),
+            'hr': hrs[0].user,
+            'candidate': candidates[0].user,
+        },
+        'questions': questions,
+        'vacancy': vacancies[0],
+        'candidate': candidates[0],
+    }
+
+
+def detail_path(prefix, model):
+    return lambda data: f'/api/{prefix}/{model.objects.order_by("id").first().pk}/'
+
+
+# Эндпоинт (имя маршрута или шаблон пути): метод, пользователь, путь, тело запроса, бюджет SQL-запросов
+# вместе с аутентификацией по JWT. Бюджет не зависит от числа строк в ответе; новый эндпоинт без бюджета
+# роняет тесты.
+QUERY_BUDGETS = {
+    'api-root': ('get', None, lambda data: '/api/', None, 0),
+    'profile': ('get', 'candidate', lambda data: '/api/profile/', None, 7),
+    'digital-maturity-submit': (
+        'post', 'hr', lambda data: '/api/digital-maturity/submit/',
+        lambda data: [{'question_id': q.pk, 'answer_value': 0.8} for q in data['questions']], 12,
+    ),
+    'recommend-resumes': ('get', 'hr', lambda data: f"/api/recommendations/resumes/{data['vacancy'].pk}/", None, 15),
+    'recommend-resumes-export': (
+        'get', 'hr', lambda data: f"/api/recommendations/resumes/{data['vacancy'].pk}/export/", None, 7,
+    ),
+    'recommend-vacancies': ('get', 'candidate', lambda data: '/api/recommendations/vacancies/', None, 7),
+    'search-candidates': ('get', 'hr', lambda data: '/api/search/candidates/?q=Python', None, 7),
+    'discipline-feedback-list': ('get', 'hr', lambda data: '/api/discipline-feedback/', None, 3),
+    'discipline-feedback-detail': ('get', 'hr', detail_path('discipline-feedback', DisciplineFeedback), None, 2),
+    'company-list': ('get', 'staff', lambda data: '/api/companies/', None, 3),
+    'company-detail': ('get', 'staff', detail_path('companies', Company), None, 2),
+    'candidate-list': ('get', 'staff', lambda data: '/api/candidates/', None, 7),
+    'candidate-detail': ('get', 'staff', detail_path('candidates', Candidate), None, 6),
+    'education-list': ('get', 'staff', lambda data: '/api/educations/', None, 3),
+    'education-detail': ('get', 'staff', detail_path('educations', Education), None, 2),
+    'experience-list': ('get', 'staff', lambda data: '/api/experiences/', None, 3),
+    'experience-detail': ('get', 'staff', detail_path('experiences', Experience), None, 2),
+    'resume-list': ('get', 'staff', lambda data: '/api/resumes/', None, 4),
+    'resume-detail': ('get', 'staff', detail_path('resumes', Resume), None, 3),
+    'vacancy-list': ('get', 'hr', lambda data: '/api/vacancies/', None, 4),
+    'vacancy-detail': ('get', 'hr', detail_path('vacancies', Vacancy), None, 3),
+    'skill-list': ('get', 'staff', lambda data: '/api/skills/', None, 3),
+    'skill-detail': ('get', 'staff', detail_path('skills', Skill), None, 2),
+    'candidateskill-list': ('get', 'staff', lambda data: '/api/candidate-skills/', None, 3),
+    'candidateskill-detail': ('get', 'staff', detail_path('candidate-skills', CandidateSkill), None, 2),
+    'vacancyskill-list': ('get', 'staff', lambda data: '/api/vacancy-skills/', None, 3),
+    'vacancyskill-detail': ('get', 'staff', detail_path('vacancy-skills', VacancySkill), None, 2),
+    'hr-list': ('get', 'staff', lambda data: '/api/hrs/', None, 3),
+    'hr-detail': ('get', 'staff', detail_path('hrs', HR), None, 2),
+    'maturityquestion-list': ('get', 'staff', lambda data: '/api/maturity-questions/', None, 2),
+    'maturityquestion-detail': ('get', 'staff', detail_path('maturity-questions', MaturityQuestion), None, 2),
+    'registration/': (
+        'post', None, lambda data: '/api/user/registration/',
+        lambda data: {'email': 'new@example.com', 'password': 'password123'}, 5,
+    ),
+    'login/': (
+        'post', None, lambda data: '/api/user/login/',
+        lambda data: {'email': 'candidate0@example.com', 'password': 'password123'}, 4,
+    ),
+    'user/': ('get', 'candidate', lambda data: '/api/user/user/', None, 1),
+    'refresh/': (
+        'post', None, lambda data: '/api/user/refresh/',
+        lambda data: {'refresh_token': RefreshToken.issue(data['users']['candidate'])}, 5,
+    ),
+}
+
+
+class QueryBudgetTests(TestCase):
+    """Число SQL-запросов каждого эндпоинта одинаково при разном объеме данных и не выше бюджета."""
+    SIZES = (2, 6)
+
+    def routes(self):
+        for urlconf in (finder_urls, authorization_urls):
+            for pattern in urlconf.urlpatterns:
+                yield pattern.name or str(pattern.pattern)
+
+    def test_every_endpoint_has_budget(self):
+        self.assertEqual(set(self.routes()), set(QUERY_BUDGETS))
+
+    def count_queries(self, data, method, role, path, body):
+        client = APIClient()
+        if role is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Token {data['users'][role].access_token}")
+        path = path(data)
+        body = body(data) if body is not None else None
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(path, body, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300, f'{method.upper()} {path}: {response.status_code}')
+        return len(queries)
+
+    def test_budgets(self):
+        counts = {name: [] for name in QUERY_BUDGETS}
+        for size in self.SIZES:
+            with transaction.atomic():
+                data = seed_query_budget_data(size)
+                for name, (method, role, path, body, budget) in QUERY_BUDGETS.items():
+                    with transaction.atomic():
+                        counts[name].append(self.count_queries(data, method, role, path, body))
+                        transaction.set_rollback(True)
+                transaction.set_rollback(True)
 
-# Create your tests here.
+        for name, (method, role, path, body, budget) in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                small, large = counts[name]
+                self.assertEqual(small, large, f'{name}: число запросов растет с данными ({small} → {large})')
+                self.assertLessEqual(large, budget, f'{name}: {large} запросов при бюджете {budget}')
@@ -6,7 +6,8 @@ from .views import (
     ExperienceViewSet, ResumeViewSet, VacancyViewSet,
     SkillViewSet, CandidateSkillViewSet, VacancySkillViewSet,
     HRViewSet, DisciplineFeedbackViewSet, ProfileView,
-    MaturityQuestionViewSet, SubmitCompanyMaturityAnswers, RecommendCandidatesView
+    MaturityQuestionViewSet, SubmitCompanyMaturityAnswers, RecommendCandidatesView,
+    RecommendVacanciesView, CandidateSearchView, ExportRankedCandidatesView,
 )
 
 router = DefaultRouter()
@@ -28,5 +29,11 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('digital-maturity/submit/', SubmitCompanyMaturityAnswers.as_view(), name='digital-maturity-submit'),
     path('recommendations/resumes/<int:vacancy_id>/', RecommendCandidatesView.as_view(), name='recommend-resumes'),
+    path(
+        'recommendations/resumes/<int:vacancy_id>/export/', ExportRankedCandidatesView.as_view(),
+        name='recommend-resumes-export',
+    ),
+    path('recommendations/vacancies/', RecommendVacanciesView.as_view(), name='recommend-vacancies'),
+    path('search/candidates/', CandidateSearchView.as_view(), name='search-candidates'),
 ] + router.urls
 
@@ -1,8 +1,124 @@
 # В utils.py
-def calculate_match_score(candidate, vacancy, maturity_weight=0.3):
+from finddotemployee.timing import timed
+
+DEFAULT_MATURITY_WEIGHT = 0.3
+
+
+def parse_maturity_weight(value, default=DEFAULT_MATURITY_WEIGHT):
+    """Разбирает maturity_weight из query string, при ошибке возвращает значение по умолчанию."""
+    try:
+        return float(value if value is not None else default)
+    except (TypeError, ValueError):
+        return default
+
+
+# Уровни 1–3 и верхние границы их баллов, выше последней границы — уровень 4
+MATURITY_LEVEL_BOUNDS = ((1, 0.25), (2, 0.5), (3, 0.75))
+
+
+def maturity_level(score):
+    """Переводит балл 0–1 в уровень цифровой зрелости 1–4."""
+    for level, bound in MATURITY_LEVEL_BOUNDS:
+        if score <= bound:
+            return level
+    return 4
+
+
+def context_maturity_level(weighted_sum, skill_count, overlap_sum=None, overlap_count=0):
+    """
+    Уровень цифровой зрелости (1–4) по агрегатам навыков кандидата.
+
+    Args:
+        weighted_sum: Сумма вес навыка * уровень / 5 по всем навыкам кандидата.
+        skill_count: Число навыков кандидата.
+        overlap_sum: Та же сумма по навыкам, общим с вакансией; None — без контекста вакансии.
+        overlap_count: Число навыков, общих с вакансией.
+    """
+    if not skill_count:
+        return 1  # Минимальный уровень при отсутствии навыков
+
+    # Базовый расчет: среднее взвешенное значение (вес навыка * уровень владения)
+    base_score = weighted_sum / skill_count
+
+    # Бонус за дополнительные навыки: все навыки кандидата минус общие с вакансией
+    if overlap_sum is not None:
+        extra_count = skill_count - overlap_count
+        if extra_count:
+            extra_bonus = min((weighted_sum - overlap_sum) / extra_count, 0.2)  # Ограничение бонуса
+            base_score = min(base_score + extra_bonus, 1.0)  # Не выше 1.0
+
+    # Округление убирает погрешность порядка суммирования в Python, NumPy и SQL на границах уровней
+    return maturity_level(round(base_score, 9))
+
+
+def skills_maturity_level(skills, vacancy_skill_ids=None):
+    """
+    Уровень цифровой зрелости (1–4) по навыкам кандидата.
+
+    Args:
+        skills: Список пар (id навыка, вес навыка * уровень / 5).
+        vacancy_skill_ids: Множество id навыков вакансии для бонуса за дополнительные навыки.
+    """
+    skills = skills or []
+    weighted_sum = sum(value for _, value in skills)
+    if vacancy_skill_ids is None:
+        return context_maturity_level(weighted_sum, len(skills))
+
+    overlap = [value for skill_id, value in skills if skill_id in vacancy_skill_ids]
+    return context_maturity_level(weighted_sum, len(skills), sum(overlap), len(overlap))
+
+
+def skill_match_score(candidate_skills, vacancy_skills):
+    """
+    Доля покрытия навыков вакансии навыками кандидата (0–1).
+
+    Args:
+        candidate_skills: Словарь {id навыка: уровень / 5}.
+        vacancy_skills: Список пар (id навыка, вес навыка) вакансии.
+
+    Returns:
+        float | None: None, если суммарный вес навыков вакансии равен нулю.
+    """
+    total_skill_weight = sum(weight for _, weight in vacancy_skills)
+    if total_skill_weight == 0:
+        return None
+
+    match_sum = 0.0
+    for skill_id, skill_weight in vacancy_skills:
+        match_sum += candidate_skills.get(skill_id, 0.0) * skill_weight
+    return match_sum / total_skill_weight
+
+
+def blend_components(skill_score, maturity_score, maturity_weight=DEFAULT_MATURITY_WEIGHT):
+    """
+    Неокругленный итоговый балл по компонентам 0–1.
+
+    Тем же выражением балл считается в SQL (см. services.blended_score), поэтому
+    значения из БД и из Python совпадают побитово.
+    """
+    return (1 - maturity_weight) * skill_score + maturity_weight * maturity_score
+
+
+def blend_match_score(skill_score, maturity, maturity_weight=DEFAULT_MATURITY_WEIGHT):
+    """Итоговый балл: навыки + взвешенная зрелость (уровень 1–4), округленный до 0.001."""
+    if skill_score is None:
+        return 0.0
+    skill_score = round(skill_score, 9)  # Погрешность порядка суммирования не влияет на округление
+    maturity_score = maturity / 4.0  # Нормализация 1–4 до 0–1
+    return round(blend_components(skill_score, maturity_score, maturity_weight), 3)
+
+
+@timed('match')
+def calculate_match_score(candidate, vacancy, maturity_weight=DEFAULT_MATURITY_WEIGHT):
     """
     Рассчитывает релевантность кандидата для вакансии с учетом навыков и цифровой зрелости.
 
+    Компоненты балла берутся из актуальной строки CandidateVacancyScore, а при ее
+    отсутствии рассчитываются без записи теми же агрегатами навыков, что и в
+    services.fill_match_scores, — единственной функции, которая их сохраняет.
+    Для кандидата без общих навыков строки не бывает: его балл — сохраненная
+    зрелость unmatched_maturity.
+
     Args:
         candidate: Объект Candidate с навыками и резюме.
         vacancy: Объект Vacancy с требуемыми навыками.
@@ -11,34 +127,23 @@ def calculate_match_score(candidate, vacancy, maturity_weight=0.3):
     Returns:
         float: Итоговый балл (0–1), округленный до 0.001.
     """
-    # Сбор навыков кандидата
-    candidate_skills = {
-        cs.skill.id: (cs.rank / 5.0)
-        for cs in candidate.skills.select_related('skill')
-    }
-
-    # Сбор навыков вакансии
-    vacancy_skills = vacancy.skills.select_related('skill')
-    total_skill_weight = sum(vs.skill.weight for vs in vacancy_skills)
-
-    # Проверка на отсутствие навыков
-    if total_skill_weight == 0:
-        return 0.0
-
-    # Расчет соответствия навыков
-    match_sum = 0.0
-    for vs in vacancy_skills:
-        skill_id = vs.skill.id
-        skill_weight = vs.skill.weight
-        candidate_match = candidate_skills.get(skill_id, 0.0)
-        match_sum += candidate_match * skill_weight
+    from .models import current_match_scores
+    from .services import get_vacancy_skills, match_components, overlap_aggregates
 
-    skill_match_score = match_sum / total_skill_weight
+    cached = current_match_scores(vacancy).filter(candidate=candidate).first()
+    if cached is not None:
+        candidate.vacancy_maturity_score = cached.maturity
+        return blend_match_score(cached.skill_match_score, cached.maturity, maturity_weight)
 
-    # Получение цифровой зрелости кандидата
-    candidate._vacancy_context = vacancy
-    maturity_score = candidate.digital_maturity_score / 4.0  # Нормализация 1–4 до 0–1
+    vacancy_skills = get_vacancy_skills(vacancy)
+    total_weight = sum(weight for _, weight in vacancy_skills)
+    if total_weight == 0:
+        return 0.0  # Проверка на отсутствие навыков
 
-    # Итоговый балл: навыки + взвешенная зрелость
-    final_score = (1 - maturity_weight) * skill_match_score + maturity_weight * maturity_score
-    return round(final_score, 3)
\ No newline at end of file
+    row = next(iter(overlap_aggregates([candidate.pk], vacancy_skills)), None)
+    if row is None:
+        skill_score, maturity = 0.0, candidate.unmatched_maturity
+    else:
+        skill_score, maturity = match_components(row, total_weight)
+    candidate.vacancy_maturity_score = maturity
+    return blend_match_score(skill_score, maturity, maturity_weight)
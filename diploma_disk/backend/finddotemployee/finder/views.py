@@ -1,7 +1,14 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets
-from rest_framework.exceptions import PermissionDenied, NotFound
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
 from rest_framework.generics import ListAPIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.negotiation import BaseContentNegotiation
+
+from authorization.principal import get_principal
 
 from .models import (
     Company, Candidate, Education, Experience, Resume,
@@ -13,11 +20,17 @@ from .serializers import (
     SkillSerializer, CandidateSkillSerializer, VacancySkillSerializer,
     HRSerializer, CreateHRSerializer
 )
+from .pagination import RankingCursorPagination
+from .profile_cache import get_cached_profile, profile_etag, profile_version, set_cached_profile
+from .services import (
+    filter_candidates, order_by_search_rank, rank_candidates, recommend_vacancies, search_candidates,
+)
+from .utils import parse_maturity_weight
 from rest_framework.permissions import IsAuthenticated
 
 
 class CompanyViewSet(viewsets.ModelViewSet):
-    queryset = Company.objects.all()
+    queryset = Company.objects.order_by('id')
     serializer_class = CompanySerializer
 
 
@@ -29,20 +42,22 @@ class CandidateViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Кандидат видит только себя
         if self.request.user.is_staff:
-            return super().get_queryset()
-        return Candidate.objects.filter(user=self.request.user)
+            queryset = super().get_queryset()
+        else:
+            queryset = Candidate.objects.filter(user=self.request.user)
+        return CandidateSerializer.setup_eager_loading(queryset.order_by('id'))
 
     def perform_create(self, serializer):
         serializer.save()
 
 
 class EducationViewSet(viewsets.ModelViewSet):
-    queryset = Education.objects.all()
+    queryset = Education.objects.order_by('id')
     serializer_class = EducationSerializer
 
 
 class ExperienceViewSet(viewsets.ModelViewSet):
-    queryset = Experience.objects.all()
+    queryset = Experience.objects.order_by('id')
     serializer_class = ExperienceSerializer
 
 
@@ -61,10 +76,13 @@ class ResumeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Resume.objects.all()
-        if hasattr(user, 'candidate'):
-            return Resume.objects.filter(candidate=user.candidate)
-        return Resume.objects.none()
+            queryset = Resume.objects.all()
+        else:
+            candidate_id = get_principal(user).candidate_id
+            if candidate_id is None:
+                return Resume.objects.none()
+            queryset = Resume.objects.filter(candidate_id=candidate_id)
+        return ResumeSerializer.setup_eager_loading(queryset.order_by('id'))
 
     def perform_create(self, serializer):
         if not hasattr(self.request.user, 'candidate'):
@@ -84,9 +102,9 @@ class HRViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff:
-            return HR.objects.all()
-        return HR.objects.filter(user=user)
+        queryset = HR.objects.all() if user.is_staff else HR.objects.filter(user=user)
+        # email и название компании в HRSerializer
+        return queryset.select_related('user', 'company').order_by('id')
 
     def perform_create(self, serializer):
         serializer.save()
@@ -99,49 +117,110 @@ class VacancyViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        try:
-            hr = HR.objects.get(user=user)
-            return Vacancy.objects.filter(company=hr.company)
-        except HR.DoesNotExist:
-            return Vacancy.objects.all()
+        company_id = get_principal(self.request.user).company_id
+        queryset = Vacancy.objects.prefetch_related('skills').order_by('id')
+        if company_id is not None:
+            return queryset.filter(company_id=company_id)
+        return queryset
 
     def perform_create(self, serializer):
-        try:
-            hr = HR.objects.get(user=self.request.user)
-            serializer.save(company=hr.company)
-        except HR.DoesNotExist:
+        company_id = get_principal(self.request.user).company_id
+        if company_id is None:
             raise PermissionDenied("Вы не привязаны к компании")
+        # Компания известна из роли, загружать ее для внешнего ключа не нужно
+        serializer.save(company=Company(pk=company_id))
 
 
 class SkillViewSet(viewsets.ModelViewSet):
-    queryset = Skill.objects.all()
+    queryset = Skill.objects.order_by('id')
     serializer_class = SkillSerializer
 
 
 class CandidateSkillViewSet(viewsets.ModelViewSet):
-    queryset = CandidateSkill.objects.all()
+    queryset = CandidateSkill.objects.select_related('skill').order_by('id')
     serializer_class = CandidateSkillSerializer
 
 
 class VacancySkillViewSet(viewsets.ModelViewSet):
-    queryset = VacancySkill.objects.all()
+    queryset = VacancySkill.objects.select_related('skill').order_by('id')
     serializer_class = VacancySkillSerializer
 
 
-class RecommendCandidatesView(ListAPIView):
+class QueryParamsMixin:
+    """Разбор query-параметров с ошибкой 400 при неверном значении."""
+
+    def int_param(self, name, default=None):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Ожидается целое число.'})
+
+    def float_param(self, name, default=None):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: 'Ожидается число.'})
+
+    def int_list_param(self, name):
+        """Список целых через запятую: ?skills=1,2,3."""
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return []
+        try:
+            return [int(item) for item in value.split(',') if item.strip()]
+        except ValueError:
+            raise ValidationError({name: 'Ожидается список целых чисел через запятую.'})
+
+    def bool_param(self, name):
+        return self.request.query_params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+class RecommendCandidatesView(QueryParamsMixin, ListAPIView):
+    """
+    Кандидаты по убыванию релевантности для вакансии.
+
+    Query-параметры: maturity_weight, q — полнотекстовый поиск, min_score — минимальный
+    балл, min_maturity — минимальная цифровая зрелость, min_age и max_age,
+    skills — обязательные навыки через запятую и min_skill_rank — минимальный уровень
+    владения ими, active_resume — только с активным резюме. Все фильтры применяются
+    в БД до ранжирования.
+    """
     serializer_class = CandidateSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = RankingCursorPagination
 
     def get_queryset(self):
+        return self.get_ranking(CandidateSerializer.setup_eager_loading(Candidate.objects.all()))
+
+    def get_ranking(self, candidates):
+        """Рейтинг кандидатов вакансии из URL с фильтрами из query-параметров."""
         vacancy_id = self.kwargs.get('vacancy_id')
         try:
             self.vacancy = Vacancy.objects.get(id=vacancy_id)
         except Vacancy.DoesNotExist:
             raise NotFound("Вакансия не найдена")
 
-        return Candidate.objects.all()
+        maturity_weight = parse_maturity_weight(self.request.query_params.get('maturity_weight'))
+        # Необязательный полнотекстовый фильтр: рейтинг строится только по найденным кандидатам
+        text = self.request.query_params.get('q', '').strip()
+        if text:
+            candidates = search_candidates(candidates, text)
+        candidates = filter_candidates(
+            candidates,
+            min_maturity=self.int_param('min_maturity'),
+            min_age=self.int_param('min_age'),
+            max_age=self.int_param('max_age'),
+            skill_ids=self.int_list_param('skills'),
+            min_skill_rank=self.int_param('min_skill_rank', 1),
+            active_resume=self.bool_param('active_resume'),
+        )
+        return rank_candidates(self.vacancy, candidates, maturity_weight, self.float_param('min_score'))
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -149,6 +228,152 @@ class RecommendCandidatesView(ListAPIView):
         return context
 
 
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Ответ формируется самим представлением, заголовок Accept не проверяется."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: writerow возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def batched(lines, size):
+    """Склеивает строки выгрузки в куски по size, чтобы не писать в сокет по одной."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+class ExportRankedCandidatesView(RecommendCandidatesView):
+    """
+    Выгрузка всего рейтинга кандидатов вакансии потоком NDJSON или CSV.
+
+    Query-параметры — как у recommendations/resumes/<vacancy_id>/, плюс output=ndjson
+    (по умолчанию) или csv. Рейтинг читается одним запросом порциями по chunk_size,
+    строки уходят клиенту по мере чтения, поэтому память не зависит от размера пула.
+    """
+    content_negotiation_class = IgnoreClientContentNegotiation
+    chunk_size = 2000
+    columns = ['id', 'full_name', 'email', 'age', 'match_score', 'digital_maturity', 'has_active_resume', 'skills']
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def get(self, request, *args, **kwargs):
+        # В выгрузке есть email кандидатов, которых нет в постраничной выдаче
+        if not (request.user.is_staff or get_principal(request.user).hr_id is not None):
+            raise PermissionDenied('Выгрузка рейтинга доступна только HR-менеджерам.')
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.content_types:
+            raise ValidationError({'output': 'Ожидается ndjson или csv.'})
+
+        candidates = Candidate.objects.select_related('user').prefetch_related(
+            Prefetch('skills', queryset=CandidateSkill.objects.select_related('skill').order_by('id'))
+        )
+        rows = (self.export_row(candidate) for candidate in self.get_ranking(candidates).stream(self.chunk_size))
+        lines = self.csv_lines(rows) if output == 'csv' else self.ndjson_lines(rows)
+
+        response = StreamingHttpResponse(batched(lines, 500), content_type=self.content_types[output])
+        response['Content-Disposition'] = f'attachment; filename="vacancy-{self.vacancy.pk}-candidates.{output}"'
+        return response
+
+    @staticmethod
+    def export_row(candidate):
+        return {
+            'id': candidate.pk,
+            'full_name': candidate.full_name,
+            'email': candidate.user.email,
+            'age': candidate.age,
+            'match_score': candidate.match_score,
+            'digital_maturity': candidate.vacancy_maturity_score,
+            'has_active_resume': candidate.has_active_resume,
+            'skills': {cs.skill.title: cs.rank for cs in candidate.skills.all()},
+        }
+
+    def ndjson_lines(self, rows):
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    def csv_lines(self, rows):
+        # Навыки — в формате импорта: «Python:4;SQL:3»
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns)
+        for row in rows:
+            row['skills'] = ';'.join(f'{title}:{rank}' for title, rank in row['skills'].items())
+            yield writer.writerow([row[column] for column in self.columns])
+
+
+class CandidateSearchView(ListAPIView):
+    """
+    Полнотекстовый поиск кандидатов по имени, «о себе» и опыту работы.
+
+    Query-параметр q — текст запроса. Для поиска с сортировкой по релевантности
+    вакансии тот же q передается в recommendations/resumes/<vacancy_id>/.
+    """
+    serializer_class = CandidateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'Пустой поисковый запрос.'})
+        candidates = CandidateSerializer.setup_eager_loading(Candidate.objects.all())
+        return order_by_search_rank(search_candidates(candidates, text), text)
+
+
+class RecommendVacanciesView(QueryParamsMixin, ListAPIView):
+    """
+    Лучшие вакансии для текущего кандидата.
+
+    Query-параметры: maturity_weight, limit (по умолчанию 20, не больше 100),
+    company_maturity_level и min_company_maturity_level — фильтр по уровню
+    цифровой зрелости компании.
+    """
+    serializer_class = VacancySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    default_limit = 20
+    max_limit = 100
+
+    def get_queryset(self):
+        self.candidate = getattr(self.request.user, 'candidate', None)
+        if self.candidate is None:
+            raise PermissionDenied('Рекомендации вакансий доступны только кандидатам.')
+
+        vacancies = Vacancy.objects.all()
+        level = self.int_param('company_maturity_level')
+        if level is not None:
+            vacancies = vacancies.filter(company__maturity_level=level)
+        min_level = self.int_param('min_company_maturity_level')
+        if min_level is not None:
+            vacancies = vacancies.filter(company__maturity_level__gte=min_level)
+
+        limit = min(max(self.int_param('limit', self.default_limit), 1), self.max_limit)
+        maturity_weight = parse_maturity_weight(self.request.query_params.get('maturity_weight'))
+        return recommend_vacancies(self.candidate, vacancies, maturity_weight, limit)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['candidate'] = getattr(self, 'candidate', None)
+        return context
+
+
+from django.db import transaction
+from django.utils.http import parse_etags
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -170,13 +395,12 @@ class SubmitCompanyMaturityAnswers(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        hr_qs = HR.objects.filter(user=request.user)
-        if not hr_qs.exists():
+        company_id = get_principal(request.user).company_id
+        if company_id is None:
             return Response(
                 {"detail": "Только HR‑менеджер может отвечать на анкету"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        company = hr_qs.first().company
 
         if not isinstance(request.data, list):
             return Response(
@@ -187,51 +411,81 @@ class SubmitCompanyMaturityAnswers(APIView):
         serializer = CompanyMaturityAnswerSerializer(data=request.data, many=True)
         serializer.is_valid(raise_exception=True)
 
-        for item in serializer.validated_data:
-            question = MaturityQuestion.objects.get(id=item['question_id'])
-            answer_value = item['answer_value']
-            CompanyMaturityAnswer.objects.update_or_create(
-                company=company,
-                question=question,
-                defaults={'answer_value': answer_value}
+        # При повторе вопроса в анкете действует последний ответ
+        answers = {item['question_id']: item['answer_value'] for item in serializer.validated_data}
+        company = Company.objects.get(pk=company_id)
+        with transaction.atomic():
+            CompanyMaturityAnswer.objects.bulk_create(
+                [
+                    CompanyMaturityAnswer(company=company, question_id=question_id, answer_value=answer_value)
+                    for question_id, answer_value in answers.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['company', 'question'],
+                update_fields=['answer_value'],
             )
-
-        recalculate_company_maturity(company)
+            transaction.on_commit(lambda: recalculate_company_maturity(company))
         return Response(
             {"detail": "Ответы сохранены", "maturity_level": company.maturity_level},
             status=status.HTTP_200_OK
         )
 
 class ProfileView(APIView):
+    """
+    Профиль текущего пользователя: кандидат с резюме или HR с компанией.
+
+    Ответ кэшируется по версии профиля, которую увеличивают сигналы при изменении
+    данных. На If-None-Match с актуальным ETag отвечает 304 после одного запроса версии.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Определяем роль
-        try:
-            candidate = Candidate.objects.select_related('user').get(user=request.user)
-            # вложенные резюме
-            resumes = Resume.objects.filter(candidate=candidate)
+        user_id = request.user.pk
+        version = profile_version(user_id)
+        etag = profile_etag(user_id, version)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return self.with_cache_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        payload = get_cached_profile(user_id, version)
+        if payload is None:
+            payload = self.build_payload(request)
+            if payload is None:
+                return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+            set_cached_profile(user_id, version, payload)
+        return self.with_cache_headers(Response(payload), etag)
+
+    def build_payload(self, request):
+        # Кандидат вместе со всем, что читают сериализаторы, — одним запросом и prefetch
+        candidate = CandidateSerializer.setup_eager_loading(
+            Candidate.objects.select_related('user')
+        ).filter(user=request.user).first()
+        if candidate is not None:
+            # резюме берутся из prefetch, их candidate.skills — тоже
+            resumes = candidate.resumes.all()
             serializer = CandidateSerializer(candidate, context={'request': request})
             resume_serializer = ResumeSerializer(resumes, many=True, context={'request': request})
-            return Response({
+            return {
                 'role': 'candidate',
                 'candidate': serializer.data,
                 'resumes': resume_serializer.data
-            })
-        except Candidate.DoesNotExist:
-            pass
+            }
 
-        try:
-            hr = HR.objects.select_related('user', 'company').get(user=request.user)
+        hr = HR.objects.select_related('user', 'company').filter(user=request.user).first()
+        if hr is not None:
             serializer = HRSerializer(hr, context={'request': request})
             company_serializer = CompanySerializer(hr.company, context={'request': request})
-            return Response({
+            return {
                 'role': 'hr',
                 'hr': serializer.data,
                 'company': company_serializer.data
-            })
-        except HR.DoesNotExist:
-            return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+            }
+        return None
+
+    @staticmethod
+    def with_cache_headers(response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'  # Браузер всегда перепроверяет ETag
+        return response
 
 
 
@@ -240,11 +494,13 @@ from .serializers import DisciplineFeedbackCreateSerializer
 
 
 class DisciplineFeedbackViewSet(viewsets.ModelViewSet):
-    queryset = DisciplineFeedback.objects.all()
+    # candidate нужен в DisciplineFeedback.__str__
+    queryset = DisciplineFeedback.objects.select_related('candidate').order_by('id')
     serializer_class = DisciplineFeedbackCreateSerializer
 
     def get_queryset(self):
         # HR видит только свои отзывы (опционально)
-        if self.request.user.is_authenticated and hasattr(self.request.user, "hr"):
-            return self.queryset.filter(hr=self.request.user.hr)
+        hr_id = get_principal(self.request.user).hr_id if self.request.user.is_authenticated else None
+        if hr_id is not None:
+            return self.queryset.filter(hr_id=hr_id)
         return self.queryset.none()  # или все, если нужно